@@ -1,8 +1,12 @@
 from hyperliquid.utils import constants
+import argparse
 import time
 import threading
 
 from example_utils import setup, print_json
+from http_transport import PooledTransport
+from market_data_recorder import MarketDataRecorder
+from order_manager import OrderManager, FILLED
 
 class HypeSpotPerpArbitrage:
     """
@@ -13,16 +17,48 @@ class HypeSpotPerpArbitrage:
 
     We check funding_rate every 15 minutes and check account_value every 5 minutes.
     """
-    def __init__(self, coin):
-        self.wallet, self.info, self.exchange = setup(constants.MAINNET_API_URL, skip_ws=True)
-        
+    def __init__(self, coin, wallet=None, info=None, exchange=None, recorder=None, transport=None):
+        # info and exchange can be injected, e.g. by market_data_replay.ReplayDriver.
+        if info is None or exchange is None:
+            self.wallet, self.info, self.exchange = setup(constants.MAINNET_API_URL, skip_ws=True, transport=transport)
+        else:
+            self.wallet, self.info, self.exchange = wallet, info, exchange
+
+        # If a PooledTransport is given, independent reads are sent concurrently through it.
+        self.transport = transport
+
         self.coin = coin
+
+        # If a MarketDataRecorder is given, every response the strategy consumes is recorded.
+        self.recorder = recorder
+        if self.recorder is not None:
+            self.info, self.exchange = self.recorder.attach(self.coin, self.wallet, self.info, self.exchange)
+
         self.pair = self.coin + "/USDC"
 
         self.spot_order_result = None
         self.perp_order_result = None
         self.slippage = 0.01
 
+        # Tunables, see parameter_sweep.py for finding good values.
+        # Intervals are in seconds. We enter while funding is above funding_entry_threshold and
+        # warn once the account value is within maintenance_margin_warning_ratio x maintenance margin.
+        self.funding_check_interval = 15 * 60
+        self.account_check_interval = 5 * 60
+        self.maintenance_margin_warning_ratio = 1.2
+        self.funding_entry_threshold = 0.0
+
+        # Every order goes through the order manager, so no leg can wait forever.
+        # A spot limit order is re-priced every spot_reprice_after seconds and given up after spot_order_timeout seconds.
+        self.order_manager = OrderManager(self.exchange, self.info, self.wallet)
+        if self.recorder is not None:
+            self.order_manager.clock = self.recorder.wrap_clock(self.order_manager.clock)
+        self.spot_order_timeout = 10 * 60
+        self.spot_reprice_after = 30
+        # The last spot execution and perp order, kept until none of their orders can still be live.
+        self.spot_execution = None
+        self.perp_order = None
+
         # self.allocation = self.allocate_spot_perp_balance()
         self.spot_sz_decimals = self._get_spot_sz_decimals()
         self.perp_sz_decimals = self._get_perp_sz_decimals()
@@ -46,8 +82,10 @@ class HypeSpotPerpArbitrage:
             'USDC_PERP': 50.0
         }
         """
-        spot_balance = self.get_spot_balance_by_token("USDC")
-        perp_balance = self.get_withdrawable()
+        spot_balance, perp_balance = self._gather(
+            lambda: self.get_spot_balance_by_token("USDC"),
+            self.get_withdrawable,
+        )
         total_balance = spot_balance + perp_balance
         
         return {
@@ -56,6 +94,12 @@ class HypeSpotPerpArbitrage:
             'TOTAL': total_balance
         }
     
+    def _gather(self, *calls):
+        """Runs independent reads concurrently if we have a transport, else one after another."""
+        if self.transport is None:
+            return [call() for call in calls]
+        return self.transport.gather(*calls)
+
     # Function to get balance by token_name
     def get_spot_balance_by_token(self, token_name):
         """
@@ -238,43 +282,34 @@ class HypeSpotPerpArbitrage:
         return px, sz
 
     def place_spot_limit_order(self, is_buy=True):
-            # Place limit order buy at the first ask price
+        """
+        Works a spot limit order until it is filled or self.spot_order_timeout has passed,
+        chasing the price if the book moves away from it.
+        Return the OrderExecution; its filled_sz may be less than the target (or 0) on timeout.
+        """
+        # Place limit order buy at the first ask price
         if is_buy:
-            price = self._spot_bid_price_at_level(1)
-            size = self.allocation / price
+            price_fn = lambda: self._spot_bid_price_at_level(1)
+            size = self.allocation / price_fn()
         else:
             # Place limit order sell at the first bid price
             # And sell all the spot balance
-            price = self._spot_ask_price_at_level(1)
+            price_fn = lambda: self._spot_ask_price_at_level(1)
             size = self.get_spot_balance_by_token(self.coin)
 
-        # Round the price and size to be compliant with hyperliquid's requirement
-        price, size = self._round_spot_px_sz(price, size)
-
         # Using self.pair means this is a SPOT order.
-        self.spot_order_result = self.exchange.order(self.pair, is_buy, size, price, {"limit": {"tif": "Gtc"}})
-
-        # Query the order status by oid and Wait for spot order to be filled before continue
-        # The Waiting part only works when we place limit order.
-        if self.spot_order_result["status"] == "ok":
-            status = self.spot_order_result["response"]["data"]["statuses"][0]
-            if "resting" in status:
-                oid = status["resting"]["oid"]
-                order_status = self.exchange.info.query_order_by_oid(self.wallet, oid)
-                print("Order status by oid:", order_status)
-
-                # Wait until filled
-                while True:
-                    order_status = self.exchange.info.query_order_by_oid(self.wallet, oid)
-                    if order_status['order']['status'] == 'filled':
-                        break
-
-                    if is_buy:
-                        print("Waiting for spot buy order to be filled.")
-                    else:
-                        print("Waiting for spot sell order to be filled.")
-
-        return self.spot_order_result
+        # The price and size are rounded by _round_spot_px_sz to be compliant with hyperliquid's requirement.
+        execution = self.order_manager.chase(
+            self.pair, is_buy, size, price_fn, self._round_spot_px_sz,
+            timeout=self.spot_order_timeout, reprice_after=self.spot_reprice_after,
+        )
+        if execution.last_order is not None:
+            self.spot_order_result = execution.last_order.response
+        self.spot_execution = execution
+
+        side = "buy" if is_buy else "sell"
+        print(f"Spot {side} filled {execution.filled_sz}/{execution.target_sz} {self.coin} in {len(execution.orders)} orders.")
+        return execution
     
     def _spot_ask_price_at_level(self, level):
         data = self.info.l2_snapshot(self.pair)
@@ -297,7 +332,8 @@ class HypeSpotPerpArbitrage:
         return float(bids[level]['px'])
         
     def place_perp_limit_order(self, size, price, is_buy=False):
-        self.perp_order_result = self.exchange.order(self.coin, is_buy, size, price, {"limit": {"tif": "Gtc"}})
+        order = self.order_manager.place(self.coin, is_buy, size, price)
+        self.perp_order_result = order.response
 
         # print_json(self.perp_order_result)
 
@@ -331,36 +367,72 @@ class HypeSpotPerpArbitrage:
         print(f"There are {size} {self.coin} in the balance.")
         print(f"We are going to open corresponding amount of short position.")
 
-        self.perp_order_result = self.exchange.market_open(self.coin, is_buy, size, slippage=self.slippage)
-        if self.perp_order_result["status"] == "ok":
-            for status in self.perp_order_result["response"]["data"]["statuses"]:
-                try:
-                    filled = status["filled"]
-                    print(f'Order #{filled["oid"]} filled {filled["totalSz"]} @{filled["avgPx"]}')
-                except KeyError:
-                    print(f'Error: {status["error"]}')        
+        order = self.order_manager.market_open(self.coin, is_buy, size, self.slippage)
+        self.perp_order = order
+        self.perp_order_result = order.response
+        if order.state == FILLED:
+            print(f'Order #{order.oid} filled {order.filled_sz} @{order.avg_px}')
+        elif order.filled_sz > 0:
+            print(f'Order #{order.oid} only filled {order.filled_sz} of {order.sz} @{order.avg_px}')
+        else:
+            print(f'Error: perp order {order.cloid} was {order.state}: {order.error}')
 
-        return self.perp_order_result
+        return order
 
-    def close_positions(self):   
+    def close_positions(self):
+        """
+        Sells all spot and buys back the short, then sets is_spot_open and is_perp_open from what actually filled.
+        If the spot sell does not complete, only as much of the short as was sold is bought back, so we stay hedged.
+        """
         # Sell all spot 
         print(f"We try to sell all {self.coin}.")
         coin_spot_balance = self.get_spot_balance_by_token(self.coin)
+        spot_execution = None
         if coin_spot_balance > 0:
-            self.place_spot_limit_order(is_buy=False)
+            spot_execution = self.place_spot_limit_order(is_buy=False)
+            coin_spot_balance = self.get_spot_balance_by_token(self.coin)
         else:
             print(f"No spot balance. Nothing to sell.")
-            
+        # Dust below the spot size decimals cannot be sold and does not count as an open leg.
+        _, spot_left = self._round_spot_px_sz(1.0, coin_spot_balance)
+        self.is_spot_open = spot_left > 0 or (spot_execution is not None and spot_execution.has_live_orders)
+
         # Close short perp
-        print(f"We try to close all {self.coin}.")
-        order_result = self.exchange.market_close(self.coin)
-        if order_result["status"] == "ok":
-            for status in order_result["response"]["data"]["statuses"]:
-                try:
-                    filled = status["filled"]
-                    print(f'Order #{filled["oid"]} filled {filled["totalSz"]} @{filled["avgPx"]}')
-                except KeyError:
-                    print(f'Error: {status["error"]}')
+        position_sz = self.get_perp_position_size()
+        close_sz = position_sz
+        if self.is_spot_open:
+            close_sz = min(position_sz, spot_execution.filled_sz)
+            print(f"Spot is still open. We only close the {close_sz} {self.coin} short that was sold.")
+        _, close_sz = self._round_perp_px_sz(0.0, close_sz)
+
+        closed_sz = 0.0
+        if close_sz > 0:
+            print(f"We try to close {close_sz} of the {position_sz} {self.coin} short.")
+            order = self.order_manager.market_close(self.coin, True, close_sz)
+            self.perp_order = order
+            self.perp_order_result = order.response
+            closed_sz = order.filled_sz
+            if order.filled_sz > 0:
+                print(f'Order #{order.oid} filled {order.filled_sz} @{order.avg_px}')
+            else:
+                print(f'Error: perp close order {order.cloid} was {order.state}: {order.error}')
+        elif position_sz == 0:
+            print(f"No {self.coin} position. Nothing to close.")
+
+        _, perp_left = self._round_perp_px_sz(0.0, position_sz - closed_sz)
+        self.is_perp_open = perp_left > 0
+
+    def get_perp_position_size(self):
+        """
+        Return the absolute size of the perp position in self.coin, 0.0 if there is none.
+        See get_position_value for the layout of user_state.
+        """
+        data = self.info.user_state(address=self.wallet)
+        for asset_position in data.get("assetPositions", []):
+            position = asset_position["position"]
+            if position["coin"] == self.coin:
+                return abs(float(position["szi"]))
+        return 0.0
 
     def allocate_spot_perp_balance(self):
         """
@@ -467,32 +539,49 @@ class HypeSpotPerpArbitrage:
         """Checks the funding rate every half hour and manages positions."""
         while True:
             try:
-                funding_rate = self.get_funding_rate_by_token(self.coin)
-
-                # Only operate when the funding rate is positive
-                if funding_rate > 0:
-                    if not self.is_spot_open and not self.is_perp_open:
-                        self.allocation = self.allocate_spot_perp_balance()
-                        self.place_spot_limit_order(is_buy=True)
-                        self.place_perp_market_order(is_buy=False)
-                        self.is_perp_open = True
-                        # self.initial_position_value = self.get_position_value()
-                    else:
-                        print(f"Orders are open and funding rate {funding_rate} is positive.")
-                
-                else:
-                    if self.is_spot_open and self.is_perp_open:
-                        print(f"Funding rate is {funding_rate}, negative. We close positions.")
-                        self.close_positions()
-                        self.is_spot_open = False
-                        self.is_perp_open = False
+                self._check_funding_rate_once()
 
-                # Sleep for 15 minutes before checking the funding rate again
-                time.sleep(15 * 60)
+                # Sleep for 15 minutes (by default) before checking the funding rate again
+                time.sleep(self.funding_check_interval)
 
             except Exception as e:
                 print(f"Strategy errs: {e}")
                 time.sleep(60)
+
+    def _check_funding_rate_once(self):
+        """One iteration of check_funding_rate, without the sleep."""
+        if self.recorder is not None:
+            self.recorder.mark("check_funding_rate", self._position_flags())
+
+        funding_rate = self.get_funding_rate_by_token(self.coin)
+
+        # Placing more orders on top of one that may still be live could double a leg.
+        if self._settle_live_orders():
+            print("Some orders may still be live. We wait for them to settle before placing more.")
+            return
+
+        # Only operate when the funding rate is positive (above funding_entry_threshold)
+        if funding_rate > self.funding_entry_threshold:
+            if not self.is_spot_open and not self.is_perp_open:
+                self.allocation = self.allocate_spot_perp_balance()
+                spot_execution = self.place_spot_limit_order(is_buy=True)
+                # An order we could not cancel may still fill, so it keeps the spot leg open.
+                self.is_spot_open = spot_execution.filled_sz > 0 or spot_execution.has_live_orders
+                if spot_execution.filled_sz > 0:
+                    self._open_perp_hedge()
+                # self.initial_position_value = self.get_position_value()
+            elif not self.is_perp_open:
+                # The spot leg filled but the short did not; retry it rather than sit unhedged.
+                print("Spot is open but perp is not. We retry the short.")
+                self._open_perp_hedge()
+            else:
+                print(f"Orders are open and funding rate {funding_rate} is positive.")
+
+        else:
+            # Close whichever legs are open, so a half open position does not linger.
+            if self.is_spot_open or self.is_perp_open:
+                print(f"Funding rate is {funding_rate}, not above {self.funding_entry_threshold}. We close positions.")
+                self.close_positions()
     
     # This function is deprecated.
     def check_position_value(self):
@@ -512,8 +601,6 @@ class HypeSpotPerpArbitrage:
                     if current_position_value <= threshold:
                         print(f"Position value fell by 40% (current: {current_position_value}, threshold: {threshold}). Closing positions.")
                         self.close_positions()
-                        self.is_spot_open = False
-                        self.is_perp_open = False
                     else:
                         print(f"Position value is safe. Current: {current_position_value}, Threshold: {threshold}")
 
@@ -527,20 +614,60 @@ class HypeSpotPerpArbitrage:
     def check_account_value(self):
         while True:
             try:
-                user_state = self.info.user_state(address=self.wallet)
-                if self.is_perp_open:
-                    relevant_values = self._extract_relevant_values(user_state)
-                    self._check_and_warn(relevant_values)
-                else:
-                    print("Perps not open yet. Waiting for perps to open.")
-
-                # Sleep for 5 minutes before checking the account value again
-                time.sleep(5 * 60)
+                self._check_account_value_once()
+
+                # Sleep for 5 minutes (by default) before checking the account value again
+                time.sleep(self.account_check_interval)
 
             except Exception as e:
                 print(f"Account value check error: {e}")
                 time.sleep(60)
 
+    def _position_flags(self):
+        """The state check_funding_rate and check_account_value share, as recorded with every step."""
+        return {"is_spot_open": self.is_spot_open, "is_perp_open": self.is_perp_open}
+
+    def _open_perp_hedge(self):
+        perp_order = self.place_perp_market_order(is_buy=False)
+        if perp_order is None:
+            # No spot balance to hedge, e.g. a spot buy that never filled got cancelled after all.
+            self.is_spot_open = False
+        self.is_perp_open = perp_order is not None and perp_order.filled_sz > 0
+
+    def _settle_live_orders(self):
+        """
+        Retries cancelling spot orders whose cancel was not confirmed, and re-queries a perp order
+        whose status is unknown. Return True if any of them may still be live.
+        """
+        live = False
+        if self.spot_execution is not None:
+            for order in self.spot_execution.orders:
+                if not order.is_terminal:
+                    self.order_manager.cancel(order)
+            live = self.spot_execution.has_live_orders
+
+        if self.perp_order is not None and not self.perp_order.is_terminal:
+            self.order_manager.refresh(self.perp_order)
+            if self.perp_order.is_terminal:
+                # Now we know what the order did, trust the position rather than the order.
+                _, perp_sz = self._round_perp_px_sz(0.0, self.get_perp_position_size())
+                self.is_perp_open = perp_sz > 0
+            else:
+                live = True
+        return live
+
+    def _check_account_value_once(self):
+        """One iteration of check_account_value, without the sleep."""
+        if self.recorder is not None:
+            self.recorder.mark("check_account_value", self._position_flags())
+
+        user_state = self.info.user_state(address=self.wallet)
+        if self.is_perp_open:
+            relevant_values = self._extract_relevant_values(user_state)
+            self._check_and_warn(relevant_values)
+        else:
+            print("Perps not open yet. Waiting for perps to open.")
+
     def _extract_relevant_values(self, data):
         """
         Extracts relevant values from the provided data.
@@ -634,7 +761,7 @@ class HypeSpotPerpArbitrage:
         mark_price = values["mark_price"]
         
         # Define a warning threshold (e.g., account value close to 1.2x maintenance margin)
-        warning_threshold = maintenance_margin * 1.2
+        warning_threshold = maintenance_margin * self.maintenance_margin_warning_ratio
 
         print("Checking account status...")
         print(f"Account Value: {account_value}")
@@ -667,5 +794,12 @@ class HypeSpotPerpArbitrage:
         account_value_thread.join()            
 
 if __name__ == "__main__":
-    arbitrage = HypeSpotPerpArbitrage("HYPE")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--record", help="record every market data response to this file for later replay")
+    parser.add_argument("--pool-size", type=int, default=10, help="keep-alive connections per host")
+    args = parser.parse_args()
+
+    recorder = MarketDataRecorder(args.record) if args.record else None
+    transport = PooledTransport(pool_maxsize=args.pool_size)
+    arbitrage = HypeSpotPerpArbitrage("HYPE", recorder=recorder, transport=transport)
     arbitrage.run_strategy()
\ No newline at end of file
@@ -0,0 +1,345 @@
+import argparse
+import cProfile
+import contextlib
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from basic_spot_perp_arb import HypeSpotPerpArbitrage
+from market_data_recorder import MarketDataReader
+
+
+# Roughly the size of Hyperliquid's universes at the time of writing.
+PERP_UNIVERSE_SIZE = 200
+SPOT_UNIVERSE_SIZE = 300
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+
+def make_payloads(coin="HYPE", perp_universe_size=PERP_UNIVERSE_SIZE, spot_universe_size=SPOT_UNIVERSE_SIZE, seed=0):
+    """
+    Builds synthetic Info payloads shaped like the real ones.
+    The coin is put at the end of the universe, which is the worst case for a linear scan.
+    Return {method_name: response}.
+    """
+    rng = random.Random(seed)
+
+    perp_names = [f"PERP{i}" for i in range(perp_universe_size - 1)] + [coin]
+    universe = [{"szDecimals": rng.randint(0, 5), "name": name, "maxLeverage": 50} for name in perp_names]
+    asset_ctxs = []
+    for _ in perp_names:
+        px = rng.uniform(0.01, 100_000)
+        asset_ctxs.append({
+            "funding": f"{rng.uniform(-0.0001, 0.0001):.8f}",
+            "openInterest": f"{rng.uniform(0, 1e6):.4f}",
+            "prevDayPx": f"{px:.5g}",
+            "dayNtlVlm": f"{rng.uniform(0, 1e9):.8f}",
+            "premium": f"{rng.uniform(-0.001, 0.001):.8f}",
+            "oraclePx": f"{px:.5g}",
+            "markPx": f"{px:.5g}",
+            "midPx": f"{px:.5g}",
+            "impactPxs": [f"{px * 0.9999:.5g}", f"{px * 1.0001:.5g}"],
+            "dayBaseVlm": f"{rng.uniform(0, 1e6):.5f}",
+        })
+
+    # A positive funding rate for the coin keeps the strategy's positions open, which is its busiest state.
+    asset_ctxs[-1]["funding"] = "0.0000125"
+
+    spot_names = [f"SPOT{i}" for i in range(spot_universe_size - 2)] + ["USDC", coin]
+    spot_tokens = [{"name": name, "szDecimals": rng.randint(0, 5), "index": i} for i, name in enumerate(spot_names)]
+
+    user_state = {
+        "marginSummary": {"accountValue": "58.747197", "totalNtlPos": "41.356", "totalRawUsd": "100.103197", "totalMarginUsed": "41.356"},
+        "crossMarginSummary": {"accountValue": "58.747197", "totalNtlPos": "41.356", "totalRawUsd": "100.103197", "totalMarginUsed": "41.356"},
+        "crossMaintenanceMarginUsed": "6.892666",
+        "withdrawable": "0.0",
+        "assetPositions": [{
+            "type": "oneWay",
+            "position": {
+                "coin": coin, "szi": "-1.96", "leverage": {"type": "cross", "value": 1}, "entryPx": "25.454",
+                "positionValue": "41.356", "unrealizedPnl": "8.53384", "returnOnEquity": "0.17105367",
+                "liquidationPx": "43.7769086", "marginUsed": "41.356", "maxLeverage": 3,
+                "cumFunding": {"allTime": "-0.330918", "sinceOpen": "-0.236496", "sinceChange": "-0.236496"},
+            },
+        }],
+        "time": 1736481449739,
+    }
+
+    return {
+        "meta": {"universe": universe},
+        "spot_meta": {"tokens": spot_tokens, "universe": []},
+        "meta_and_asset_ctxs": [{"universe": universe}, asset_ctxs],
+        "user_state": user_state,
+    }
+
+
+def load_recorded_payloads(path):
+    """
+    Takes the last recorded response of each Info method from a MarketDataRecorder file.
+    Return ({method_name: response}, coin).
+    """
+    payloads = {}
+    coin = "HYPE"
+    with MarketDataReader(path) as reader:
+        for _, frame in reader:
+            if frame["type"] == "header":
+                coin = frame["coin"]
+            elif frame["type"] == "call" and frame["source"] == "info" and "response" in frame:
+                payloads[frame["method"]] = frame["response"]
+    missing = {"meta", "spot_meta", "meta_and_asset_ctxs", "user_state"} - set(payloads)
+    if missing:
+        raise Exception(f"{path} has no recorded response for {sorted(missing)}.")
+    return payloads, coin
+
+
+class StubInfo:
+    """Serves fixed payloads in place of hyperliquid's Info, so no time is spent on the network."""
+    def __init__(self, payloads):
+        self.payloads = payloads
+
+    def meta(self):
+        return self.payloads["meta"]
+
+    def spot_meta(self):
+        return self.payloads["spot_meta"]
+
+    def meta_and_asset_ctxs(self):
+        return self.payloads["meta_and_asset_ctxs"]
+
+    def user_state(self, address):
+        return self.payloads["user_state"]
+
+
+class StubExchange:
+    """Fails loudly if a benchmark ever tries to trade."""
+    def __getattr__(self, name):
+        raise Exception(f"The benchmarks must not reach the exchange (called {name}).")
+
+
+def make_strategy(payloads, coin):
+    arbitrage = HypeSpotPerpArbitrage(coin, wallet="0x0", info=StubInfo(payloads), exchange=StubExchange())
+    # Set the position flags so that the phases below only do their read-side work and
+    # never reach the exchange: open while funding is positive, closed otherwise.
+    is_open = arbitrage.get_funding_rate_by_token(coin) > 0
+    arbitrage.is_spot_open = is_open
+    arbitrage.is_perp_open = is_open
+    return arbitrage
+
+
+def make_benchmarks(arbitrage, payloads):
+    """
+    Return {name: callable} of the strategy's CPU-side hot paths.
+    Names starting with "phase:" run a whole step of the strategy.
+    """
+    user_state = payloads["user_state"]
+    values = arbitrage._extract_relevant_values(user_state)
+    return {
+        "_round_perp_px_sz": lambda: arbitrage._round_perp_px_sz(25.45678, 1.9876543),
+        "_round_spot_px_sz": lambda: arbitrage._round_spot_px_sz(25.45678, 1.9876543),
+        "get_funding_rate_by_token": lambda: arbitrage.get_funding_rate_by_token(arbitrage.coin),
+        "_get_token_markPx": arbitrage._get_token_markPx,
+        "_extract_relevant_values": lambda: arbitrage._extract_relevant_values(user_state),
+        "_check_and_warn": lambda: arbitrage._check_and_warn(values),
+        "phase:check_funding_rate": arbitrage._check_funding_rate_once,
+        "phase:check_account_value": arbitrage._check_account_value_once,
+    }
+
+
+def time_benchmark(func, rounds, min_round_time):
+    """
+    Times func the way pytest-benchmark does: calibrate the number of calls per round
+    so each round takes at least min_round_time, then time several rounds.
+    Return a dict of per-call statistics in microseconds.
+    """
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_round_time:
+            break
+        iterations *= 2 if elapsed == 0 else max(2, int(min_round_time / elapsed) + 1)
+
+    per_call = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        per_call.append((time.perf_counter() - start) / iterations * 1e6)
+
+    return {
+        "min_us": min(per_call),
+        "max_us": max(per_call),
+        "mean_us": statistics.mean(per_call),
+        "stddev_us": statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+        "median_us": statistics.median(per_call),
+        "rounds": rounds,
+        "iterations": iterations,
+    }
+
+
+def measure_memory(func, calls=100):
+    """
+    Return (peak_bytes, retained_blocks) per call, measured with tracemalloc.
+    peak_bytes is the transient memory a call needs; retained_blocks is the number of memory blocks
+    it leaves behind. tracemalloc traces memory, not allocation events, so this is not a count of
+    every allocation a call makes.
+    """
+    func()  # Warm up caches so they are not counted.
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        peak = 0
+        for _ in range(calls):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func()
+            _, call_peak = tracemalloc.get_traced_memory()
+            peak = max(peak, call_peak - current)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    retained = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return peak, retained / calls
+
+
+def profile_benchmark(name, func, profile_dir, calls=1000):
+    """Writes a cProfile .prof file for func, which can be opened with snakeviz or pstats."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for _ in range(calls):
+        func()
+    profiler.disable()
+    path = os.path.join(profile_dir, name.replace(":", "_") + ".prof")
+    profiler.dump_stats(path)
+    return path
+
+
+def flamegraph_benchmark(name, profile_dir, args):
+    """Records a py-spy flamegraph of one benchmark running in a child process, if py-spy is installed."""
+    if shutil.which("py-spy") is None:
+        print("py-spy is not installed. Skipping flamegraphs.")
+        return None
+    path = os.path.join(profile_dir, name.replace(":", "_") + ".svg")
+    command = ["py-spy", "record", "--format", "flamegraph", "-o", path, "--",
+               sys.executable, os.path.abspath(__file__), "--spin", name, "--spin-seconds", "5"]
+    if args.recording:
+        command += ["--recording", args.recording]
+    subprocess.run(command, check=True)
+    return path
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Return a list of regressions, i.e. benchmarks whose median got slower than
+    the baseline median by more than tolerance (a fraction, e.g. 0.2 for 20%).
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]["median_us"]
+        if result["median_us"] > base * (1 + tolerance):
+            regressions.append((name, base, result["median_us"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CPU-side hot paths of HypeSpotPerpArbitrage.")
+    parser.add_argument("--recording", help="use the payloads of a MarketDataRecorder file instead of synthetic ones")
+    parser.add_argument("--perp-universe-size", type=int, default=PERP_UNIVERSE_SIZE)
+    parser.add_argument("--spot-universe-size", type=int, default=SPOT_UNIVERSE_SIZE)
+    parser.add_argument("--only", action="append", help="only run the named benchmark (can be repeated)")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--min-round-time", type=float, default=0.05, help="seconds")
+    parser.add_argument("--profile-dir", help="write a cProfile file per benchmark (and py-spy flamegraphs with --flamegraph) here")
+    parser.add_argument("--flamegraph", action="store_true")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if any benchmark regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline, e.g. 0.2 for 20%%")
+    parser.add_argument("--spin", help=argparse.SUPPRESS)
+    parser.add_argument("--spin-seconds", type=float, default=5.0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.recording:
+        payloads, coin = load_recorded_payloads(args.recording)
+    else:
+        coin = "HYPE"
+        payloads = make_payloads(coin, args.perp_universe_size, args.spot_universe_size)
+
+    # The strategy prints a lot; that is I/O, not the CPU work we want to measure.
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            arbitrage = make_strategy(payloads, coin)
+            benchmarks = make_benchmarks(arbitrage, payloads)
+
+        # Used by flamegraph_benchmark: spin on one benchmark while py-spy samples us.
+        if args.spin:
+            func = benchmarks[args.spin]
+            deadline = time.perf_counter() + args.spin_seconds
+            with contextlib.redirect_stdout(devnull):
+                while time.perf_counter() < deadline:
+                    func()
+            return 0
+
+        if args.only:
+            unknown = set(args.only) - set(benchmarks)
+            if unknown:
+                parser.error(f"unknown benchmarks {sorted(unknown)}; choose from {sorted(benchmarks)}")
+            benchmarks = {name: func for name, func in benchmarks.items() if name in args.only}
+
+        if args.profile_dir:
+            os.makedirs(args.profile_dir, exist_ok=True)
+
+        results = {}
+        for name, func in benchmarks.items():
+            with contextlib.redirect_stdout(devnull):
+                result = time_benchmark(func, args.rounds, args.min_round_time)
+                result["peak_bytes"], result["retained_blocks"] = measure_memory(func)
+                if args.profile_dir:
+                    result["profile"] = profile_benchmark(name, func, args.profile_dir)
+            if args.profile_dir and args.flamegraph:
+                result["flamegraph"] = flamegraph_benchmark(name, args.profile_dir, args)
+            results[name] = result
+
+    print(f"{'benchmark':<28}{'min':>10}{'median':>10}{'mean':>10}{'stddev':>10}{'peak KiB':>10}{'kept blks':>10}")
+    for name, result in results.items():
+        print(f"{name:<28}{result['min_us']:>10.2f}{result['median_us']:>10.2f}{result['mean_us']:>10.2f}"
+              f"{result['stddev_us']:>10.2f}{result['peak_bytes'] / 1024:>10.1f}{result['retained_blocks']:>10.2f}")
+    print("Times are in microseconds per call; peak KiB and kept blocks (memory blocks left behind) are per call too.")
+
+    exit_code = 0
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}. Run with --save-baseline first.")
+            exit_code = 1
+        else:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            regressions = compare_with_baseline(results, baseline, args.tolerance)
+            for name, base, median in regressions:
+                print(f"Regression: {name} median {median:.2f}us vs baseline {base:.2f}us.")
+            if regressions:
+                exit_code = 1
+            else:
+                print(f"No regressions against {args.baseline}.")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"Saved baseline to {args.baseline}.")
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
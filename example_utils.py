@@ -8,7 +8,7 @@ from hyperliquid.exchange import Exchange
 from hyperliquid.info import Info
 
 
-def setup(base_url=None, skip_ws=False):
+def setup(base_url=None, skip_ws=False, transport=None):
     """
     Initializes the trading environment by loading configuration, verifying account status, 
     and preparing essential components for interaction with Hyperliquid.
@@ -16,6 +16,8 @@ def setup(base_url=None, skip_ws=False):
     Parameters:
     base_url (str, optional): Base URL of the exchange API. Defaults to None.
     skip_ws (bool, optional): Flag to skip WebSocket connection setup. Defaults to False.
+    transport (PooledTransport, optional): Shared HTTP transport for all clients. Defaults to None,
+           in which case every client keeps its own session.
 
     Returns:
     tuple: A tuple containing the account address (str), an instance of Info (Info), 
@@ -35,6 +37,8 @@ def setup(base_url=None, skip_ws=False):
     if address != account.address:
         print("Running with agent address:", account.address)
     info = Info(base_url, skip_ws)
+    if transport is not None:
+        transport.attach(info)
     user_state = info.user_state(address)
     spot_user_state = info.spot_user_state(address)
     margin_summary = user_state["marginSummary"]
@@ -44,6 +48,8 @@ def setup(base_url=None, skip_ws=False):
         error_string = f"No accountValue:\nIf you think this is a mistake, make sure that {address} has a balance on {url}.\nIf address shown is your API wallet address, update the config to specify the address of your account, not the address of the API wallet."
         raise Exception(error_string)
     exchange = Exchange(account, base_url, account_address=address)
+    if transport is not None:
+        transport.attach(exchange, exchange.info)
     return address, info, exchange
 
 
@@ -0,0 +1,135 @@
+import contextvars
+import itertools
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# Inside a call run by PooledTransport.gather: an id shared by all calls of that gather, else None.
+# The recorder stores it, so a replay knows which calls may come in a different order.
+current_gather = contextvars.ContextVar("current_gather", default=None)
+
+
+class RequestTiming:
+    """Timing of one HTTP request made through PooledTransport."""
+    def __init__(self, url, request_type, status_code, started_at, elapsed, server_elapsed):
+        self.url = url
+        self.request_type = request_type
+        self.status_code = status_code
+        self.started_at = started_at
+        # Wall time of the whole call, including reading the body.
+        self.elapsed = elapsed
+        # requests' measure: from sending the request until the response headers arrived.
+        self.server_elapsed = server_elapsed
+
+    def __repr__(self):
+        return f"RequestTiming({self.request_type} {self.status_code} {self.elapsed * 1000:.1f}ms)"
+
+
+class PooledTransport:
+    """
+    One persistent HTTP/1.1 keep-alive session shared by every Info/Exchange client of the strategy,
+    so each request reuses a pooled, already handshaken TLS connection instead of opening a new one.
+
+    The hyperliquid SDK only ever calls client.session.post(url, json=..., timeout=...), so attach()
+    simply installs the transport as each client's session. That also lets us time every request.
+
+    Parameters:
+        pool_maxsize (int): Connections kept alive per host.
+        host_pool_sizes (dict): Per-host override, {"https://api.hyperliquid.xyz": 20}.
+        max_workers (int): Threads used by gather() to run independent reads concurrently.
+        max_retries (int): Retries for failed connections (not for requests that got a response).
+        keep_timings (int): Number of most recent RequestTimings kept in self.timings.
+    """
+    def __init__(self, pool_maxsize=10, host_pool_sizes=None, max_workers=4, max_retries=0, keep_timings=10_000):
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=max_retries)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        for host, pool_size in (host_pool_sizes or {}).items():
+            self.session.mount(host, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=max_retries))
+
+        self.timings = deque(maxlen=keep_timings)
+        self._timings_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transport")
+        self._gather_ids = itertools.count(1)
+
+    @property
+    def headers(self):
+        return self.session.headers
+
+    def attach(self, *clients):
+        """Makes every given Info/Exchange client send its requests through this transport."""
+        for client in clients:
+            client.session = self
+
+    def post(self, url, json=None, timeout=None):
+        started_at = time.time()
+        start = time.perf_counter()
+        response = self.session.post(url, json=json, timeout=timeout)
+        # Read the body before stopping the clock; the SDK parses it right after.
+        response.content
+        elapsed = time.perf_counter() - start
+
+        # Info requests carry their type in the payload; Exchange requests carry an action.
+        request_type = "unknown"
+        if isinstance(json, dict):
+            if "type" in json:
+                request_type = json["type"]
+            elif isinstance(json.get("action"), dict):
+                request_type = json["action"].get("type", "action")
+
+        timing = RequestTiming(url, request_type, response.status_code, started_at, elapsed, response.elapsed.total_seconds())
+        with self._timings_lock:
+            self.timings.append(timing)
+        return response
+
+    def gather(self, *calls):
+        """
+        Runs independent zero-argument calls concurrently, e.g.
+            spot, perp = transport.gather(lambda: info.spot_user_state(wallet), lambda: info.user_state(wallet))
+        Return their results in order. The first exception raised by any call is re-raised.
+        Each call runs in a copy of the caller's context, so context variables (like the
+        recorder's current tick) carry over, with current_gather set to this gather's id.
+        """
+        gather_id = next(self._gather_ids)
+        futures = []
+        for call in calls:
+            context = contextvars.copy_context()
+            context.run(current_gather.set, gather_id)
+            futures.append(self._executor.submit(context.run, call))
+        return [future.result() for future in futures]
+
+    def timing_summary(self):
+        """
+        Return {request_type: {"count", "mean_ms", "p50_ms", "p99_ms", "max_ms"}} over the kept timings.
+        """
+        with self._timings_lock:
+            timings = list(self.timings)
+
+        by_type = {}
+        for timing in timings:
+            by_type.setdefault(timing.request_type, []).append(timing.elapsed * 1000)
+
+        summary = {}
+        for request_type, elapsed in by_type.items():
+            elapsed.sort()
+            summary[request_type] = {
+                "count": len(elapsed),
+                "mean_ms": statistics.mean(elapsed),
+                "p50_ms": elapsed[len(elapsed) // 2],
+                "p99_ms": elapsed[min(len(elapsed) - 1, int(len(elapsed) * 0.99))],
+                "max_ms": elapsed[-1],
+            }
+        return summary
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
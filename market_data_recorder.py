@@ -0,0 +1,215 @@
+import contextvars
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from http_transport import current_gather
+
+
+# Every frame is a fixed header followed by a zlib-compressed JSON payload.
+# Header: (timestamp in ns, payload length in bytes), little endian.
+FILE_MAGIC = b"SPARB001"
+FRAME_HEADER = struct.Struct("<QI")
+
+# The tick of the step the current thread (or PooledTransport.gather worker) is running.
+_current_tick = contextvars.ContextVar("current_tick", default=None)
+
+
+class MarketDataRecorder:
+    """
+    Records every Info response, Exchange response and WebSocket message the strategy consumes.
+
+    Frames are written to a single append-only file so that MarketDataReader can mmap it
+    and market_data_replay.ReplayDriver can feed the exact same inputs back later.
+
+    Each thread of the strategy marks the start of a step (one iteration of check_funding_rate
+    or check_account_value) with mark(). Every call made afterwards on that thread (or on the
+    workers it hands calls to through PooledTransport.gather) is tagged with the step's tick id,
+    so the interleaving of the threads can be undone on replay. A step can start while the other
+    thread's step is still running, so mark() also records the strategy state the step starts from.
+    Calls made concurrently by one
+    PooledTransport.gather share a "gather" id, since they may finish in any order.
+
+    Frame payloads look like:
+        {"type": "header", "version": 1, "coin": "HYPE", "wallet": "0x..."}
+        {"type": "tick", "tick": 3, "step": "check_funding_rate",
+         "state": {"is_spot_open": false, "is_perp_open": false}}
+        {"type": "call", "tick": 3, "source": "info", "method": "meta_and_asset_ctxs",
+         "args": [], "kwargs": {}, "gather": null, "response": [...]}
+        {"type": "call", "tick": 3, "source": "clock", "method": "time", ..., "response": 1736481449.7}
+        {"type": "ws", "tick": null, "subscription": {...}, "msg": {...}}
+    """
+    def __init__(self, path, compress_level=1):
+        self.path = path
+        self.compress_level = compress_level
+
+        self._file = open(path, "wb")
+        self._file.write(FILE_MAGIC)
+        self._lock = threading.Lock()
+        self._next_tick = 0
+
+    def attach(self, coin, wallet, info, exchange):
+        """
+        Writes the header and wraps the strategy's clients.
+        Return (recording_info, recording_exchange).
+        """
+        self._write({"type": "header", "version": 1, "coin": coin, "wallet": wallet})
+        self.mark("__init__")
+
+        recording_info = RecordingProxy(info, self, "info")
+        recording_exchange = RecordingProxy(exchange, self, "exchange", nested=("info",))
+        return recording_info, recording_exchange
+
+    def wrap_clock(self, clock):
+        """Return a clock function that records every reading, so replayed deadlines expire exactly as they did live."""
+        def recorded_clock():
+            now = clock()
+            self.record_call("clock", "time", (), {}, response=now)
+            return now
+
+        return recorded_clock
+
+    def mark(self, step, state=None):
+        """
+        Starts a new tick for the calling thread.
+        state is the strategy state shared between its threads, e.g. {"is_spot_open": True, ...},
+        as the step sees it when it starts.
+        """
+        with self._lock:
+            tick = self._next_tick
+            self._next_tick += 1
+        _current_tick.set(tick)
+        self._write({"type": "tick", "tick": tick, "step": step, "state": state})
+
+    def record_call(self, source, method, args, kwargs, response=None, error=None):
+        frame = {
+            "type": "call",
+            "tick": _current_tick.get(),
+            "source": source,
+            "method": method,
+            "args": list(args),
+            "kwargs": kwargs,
+            "gather": current_gather.get(),
+        }
+        if error is not None:
+            frame["error"] = repr(error)
+        else:
+            frame["response"] = response
+        self._write(frame)
+
+    def record_ws(self, subscription, msg):
+        self._write({"type": "ws", "tick": None, "subscription": subscription, "msg": msg})
+
+    def _write(self, frame):
+        payload = zlib.compress(json.dumps(frame, default=repr).encode(), self.compress_level)
+        header = FRAME_HEADER.pack(time.time_ns(), len(payload))
+        # Flush every frame so a killed strategy still leaves everything it consumed on disk.
+        with self._lock:
+            self._file.write(header)
+            self._file.write(payload)
+            self._file.flush()
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RecordingProxy:
+    """
+    Wraps an Info or Exchange object and records the response of every method call.
+
+    Attributes listed in nested (e.g. Exchange.info) are wrapped as well, under the
+    source name "<source>.<attr>". Any other non-callable attribute is passed through.
+    """
+    def __init__(self, target, recorder, source, nested=()):
+        self._target = target
+        self._recorder = recorder
+        self._source = source
+        self._nested = nested
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name in self._nested:
+            return RecordingProxy(attr, self._recorder, f"{self._source}.{name}")
+        if not callable(attr):
+            return attr
+        if name == "subscribe":
+            return self._subscribe
+
+        def recorded(*args, **kwargs):
+            try:
+                response = attr(*args, **kwargs)
+            except Exception as e:
+                self._recorder.record_call(self._source, name, args, kwargs, error=e)
+                raise
+            self._recorder.record_call(self._source, name, args, kwargs, response=response)
+            return response
+
+        return recorded
+
+    def _subscribe(self, subscription, callback):
+        def recorded_callback(msg):
+            self._recorder.record_ws(subscription, msg)
+            callback(msg)
+
+        return self._target.subscribe(subscription, recorded_callback)
+
+
+class MarketDataReader:
+    """
+    Memory-maps a file written by MarketDataRecorder and iterates over its frames.
+    Yields (timestamp_ns, frame) tuples in the order they were written.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        if os.fstat(self._file.fileno()).st_size <= len(FILE_MAGIC):
+            self._mmap = None
+        else:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self._mmap[:len(FILE_MAGIC)] != FILE_MAGIC:
+                self.close()
+                raise Exception(f"{path} is not a market data recording.")
+
+    def __iter__(self):
+        if self._mmap is None:
+            return
+        buf = self._mmap
+        offset = len(FILE_MAGIC)
+        end = len(buf)
+        while offset + FRAME_HEADER.size <= end:
+            timestamp, length = FRAME_HEADER.unpack_from(buf, offset)
+            offset += FRAME_HEADER.size
+            # A recorder that was killed mid-write leaves a truncated last frame; stop there.
+            if offset + length > end:
+                break
+            frame = json.loads(zlib.decompress(buf[offset:offset + length]))
+            offset += length
+            yield timestamp, frame
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,263 @@
+import argparse
+import contextlib
+import io
+import json
+import re
+import time
+from collections import deque
+
+from basic_spot_perp_arb import HypeSpotPerpArbitrage
+from market_data_recorder import MarketDataReader
+
+
+# cloids are random per session, so they never match between the recording and the replay.
+CLOID_PATTERN = re.compile(r"^0x[0-9a-f]{32}$")
+
+
+def normalize_call(source, method, args, kwargs):
+    """
+    Return the call as the recorder stored it (through JSON), with cloids masked,
+    so a live call can be compared with a recorded one.
+    """
+    def mask(value):
+        if isinstance(value, str):
+            return "<cloid>" if CLOID_PATTERN.match(value) else value
+        if isinstance(value, list):
+            return [mask(item) for item in value]
+        if isinstance(value, dict):
+            return {key: mask(item) for key, item in value.items()}
+        return value
+
+    args, kwargs = json.loads(json.dumps([list(args), kwargs], default=repr))
+    return source, method, mask(args), mask(kwargs)
+
+
+class ReplayMismatchError(BaseException):
+    """
+    The strategy asked for something other than what was recorded at this point.
+    This is a BaseException so that the strategy's own "except Exception" handlers cannot swallow it.
+    """
+
+
+class RecordingEndedError(ReplayMismatchError):
+    """The recording stops in the middle of its last tick, e.g. because the strategy was killed."""
+
+
+class ReplayedCallError(Exception):
+    """Re-raises an exception that the live call raised while recording."""
+
+
+class ReplaySource:
+    """
+    Stands in for an Info or Exchange object during replay.
+
+    Every method call must match the next recorded call of the current tick (source, method
+    and arguments) and returns its response, so the strategy sees exactly what it saw live.
+    Only the calls of one PooledTransport.gather may come in a different order than recorded,
+    since they ran concurrently. Anything else raises ReplayMismatchError.
+    """
+    def __init__(self, driver, source, nested=()):
+        self._driver = driver
+        self._source = source
+        self._nested = nested
+
+    def __getattr__(self, name):
+        if name in self._nested:
+            return ReplaySource(self._driver, f"{self._source}.{name}")
+        if name == "subscribe":
+            return self._subscribe
+
+        def replayed(*args, **kwargs):
+            return self._driver._next_response(self._source, name, args, kwargs)
+
+        return replayed
+
+    def _subscribe(self, subscription, callback):
+        self._driver._subscribers.append(callback)
+        return len(self._driver._subscribers)
+
+
+class ReplayDriver:
+    """
+    Feeds a recording made by MarketDataRecorder back through HypeSpotPerpArbitrage.
+
+    Ticks are replayed in the order they were marked, each through the same step method
+    the live thread ran (_check_funding_rate_once or _check_account_value_once), without
+    any of the sleeps. Live, a step may have started while the other thread's step was still
+    running, so each step starts from the position flags recorded with its tick. WebSocket messages are delivered to subscribers in recorded order.
+    The order manager reads the recorded clock, so order deadlines expire at the same
+    poll as they did live.
+
+    Usage:
+        driver = ReplayDriver("hype.rec")
+        arbitrage = driver.run()
+    """
+    def __init__(self, path, quiet=True):
+        self.path = path
+        self.quiet = quiet
+
+        self.header = None
+        self.ticks = []
+        self.ticks_replayed = 0
+        self.truncated = False
+        self.errors = []
+        self.output = ""
+
+        self._steps = {}
+        self._current_tick = None
+        self._in_last_tick = False
+        self._pending = deque()
+        self._subscribers = []
+
+        self._load()
+
+    def _load(self):
+        # Group the calls by tick so that the interleaving of the live threads is undone.
+        calls_by_tick = {}
+        events = []
+        with MarketDataReader(self.path) as reader:
+            for _, frame in reader:
+                kind = frame["type"]
+                if kind == "header":
+                    self.header = frame
+                elif kind == "tick":
+                    calls_by_tick[frame["tick"]] = []
+                    events.append(frame)
+                elif kind == "call":
+                    frame["key"] = normalize_call(frame["source"], frame["method"], frame["args"], frame["kwargs"])
+                    calls_by_tick.setdefault(frame["tick"], []).append(frame)
+                elif kind == "ws":
+                    events.append(frame)
+
+        if self.header is None:
+            raise Exception(f"{self.path} has no header frame.")
+
+        for event in events:
+            if event["type"] == "tick":
+                event["calls"] = calls_by_tick[event["tick"]]
+        self.ticks = events
+
+    def _next_response(self, source, method, args=(), kwargs=None):
+        key = normalize_call(source, method, args, kwargs or {})
+        index = self._find_pending(key)
+        if index is None:
+            if not self._pending and self._in_last_tick:
+                raise RecordingEndedError(f"Recording ends during tick {self._current_tick}.")
+            expected = f"{self._pending[0]['source']}.{self._pending[0]['method']}" if self._pending else "nothing"
+            raise ReplayMismatchError(
+                f"Unrecorded call {source}.{method}{tuple(args)} at tick {self._current_tick}; recorded next is {expected}."
+            )
+        frame = self._pending[index]
+        del self._pending[index]
+        if "error" in frame:
+            raise ReplayedCallError(frame["error"])
+        return frame["response"]
+
+    def _find_pending(self, key):
+        """Return the index of the pending frame that matches key, or None."""
+        if not self._pending:
+            return None
+        if self._pending[0]["key"] == key:
+            return 0
+        # The calls of one gather ran concurrently and were recorded in the order they finished.
+        gather = self._pending[0].get("gather")
+        if gather is None:
+            return None
+        for index, frame in enumerate(self._pending):
+            if frame.get("gather") != gather:
+                break
+            if frame["key"] == key:
+                return index
+        return None
+
+    def run(self):
+        """
+        Replays the whole recording.
+        Return the HypeSpotPerpArbitrage instance in the state the replay left it.
+        """
+        output = io.StringIO()
+        redirect = contextlib.redirect_stdout(output) if self.quiet else contextlib.nullcontext()
+
+        self._info = ReplaySource(self, "info")
+        self._exchange = ReplaySource(self, "exchange", nested=("info",))
+        self._arbitrage = None
+
+        last_tick = max((event["tick"] for event in self.ticks if event["type"] == "tick"), default=None)
+
+        with redirect:
+            for event in self.ticks:
+                if event["type"] == "ws":
+                    for callback in self._subscribers:
+                        callback(event["msg"])
+                    continue
+
+                self._current_tick = event["tick"]
+                self._in_last_tick = event["tick"] == last_tick
+                self._pending = deque(event["calls"])
+                step = event["step"]
+
+                try:
+                    self._replay_step(step, event.get("state"))
+                except RecordingEndedError as e:
+                    # Replay what was recorded and stop where the recording stops.
+                    self.truncated = True
+                    print(e)
+                    break
+
+                if self._pending:
+                    raise ReplayMismatchError(f"{len(self._pending)} recorded calls were not consumed at tick {self._current_tick}.")
+                self.ticks_replayed += 1
+
+        self.output = output.getvalue()
+        return self._arbitrage
+
+    def _replay_step(self, step, state=None):
+        if step == "__init__":
+            self._arbitrage = HypeSpotPerpArbitrage(
+                self.header["coin"], wallet=self.header["wallet"], info=self._info, exchange=self._exchange
+            )
+            # Order deadlines run on the recorded clock readings, and polling does not wait.
+            self._arbitrage.order_manager.clock = lambda: self._next_response("clock", "time")
+            self._arbitrage.order_manager.sleep = lambda seconds: None
+            self._steps = {
+                "check_funding_rate": self._arbitrage._check_funding_rate_once,
+                "check_account_value": self._arbitrage._check_account_value_once,
+            }
+            return
+
+        if step not in self._steps:
+            raise ReplayMismatchError(f"Unknown step {step} at tick {self._current_tick}.")
+        # Start from the flags the step saw live. The other thread's step may have changed them
+        # since (live, while this one was running), so keep its values for the flags this step leaves alone.
+        state = state or {}
+        before = {name: getattr(self._arbitrage, name) for name in state}
+        for name, value in state.items():
+            setattr(self._arbitrage, name, value)
+
+        # The live loops swallow exceptions and retry; do the same so the replay keeps going.
+        try:
+            self._steps[step]()
+        except Exception as e:
+            self.errors.append((self._current_tick, step, repr(e)))
+            print(f"Replay of {step} at tick {self._current_tick} errs: {e}")
+
+        for name, value in state.items():
+            if getattr(self._arbitrage, name) == value:
+                setattr(self._arbitrage, name, before[name])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a market data recording through HypeSpotPerpArbitrage.")
+    parser.add_argument("path", help="file written by MarketDataRecorder")
+    parser.add_argument("--verbose", action="store_true", help="print the strategy's output while replaying")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    driver = ReplayDriver(args.path, quiet=not args.verbose)
+    arbitrage = driver.run()
+    elapsed = time.perf_counter() - start
+
+    print(f"Replayed {driver.ticks_replayed} ticks of {driver.header['coin']} in {elapsed:.3f}s.")
+    print(f"{len(driver.errors)} steps raised errors.")
+    if arbitrage is not None:
+        print(f"Final state: is_spot_open={arbitrage.is_spot_open}, is_perp_open={arbitrage.is_perp_open}")
@@ -0,0 +1,401 @@
+import random
+import threading
+import time
+
+from hyperliquid.utils.types import Cloid
+
+
+# Order states
+PENDING = "pending"
+RESTING = "resting"
+PARTIAL = "partial"
+FILLED = "filled"
+CANCELLED = "cancelled"
+REJECTED = "rejected"
+
+TERMINAL_STATES = {FILLED, CANCELLED, REJECTED}
+
+# Which state an order may move to from each state. Anything else is a stale update and is ignored.
+# A partially filled order that is then cancelled ends up CANCELLED with filled_sz > 0.
+TRANSITIONS = {
+    PENDING: {RESTING, PARTIAL, FILLED, CANCELLED, REJECTED},
+    RESTING: {PARTIAL, FILLED, CANCELLED, REJECTED},
+    PARTIAL: {FILLED, CANCELLED},
+    FILLED: set(),
+    CANCELLED: set(),
+    REJECTED: set(),
+}
+
+# Floating point slack when comparing sizes.
+SZ_EPSILON = 1e-9
+
+
+class ManagedOrder:
+    """
+    One order on the exchange, tracked by its client order id (cloid) and, once known, its oid.
+    history is a list of (timestamp, state) tuples.
+    """
+    def __init__(self, coin, is_buy, sz, px, cloid, created_at):
+        self.coin = coin
+        self.is_buy = is_buy
+        self.sz = sz
+        self.px = px
+        self.cloid = cloid
+        self.oid = None
+
+        self.state = PENDING
+        self.filled_sz = 0.0
+        self.avg_px = None
+        self.error = None
+        self.response = None
+        self.history = [(created_at, PENDING)]
+
+    @property
+    def remaining_sz(self):
+        return max(self.sz - self.filled_sz, 0.0)
+
+    @property
+    def is_terminal(self):
+        return self.state in TERMINAL_STATES
+
+    def transition(self, state, timestamp):
+        """Moves to state if the state machine allows it. Return True if the state changed."""
+        if state == self.state:
+            return False
+        if state not in TRANSITIONS[self.state]:
+            return False
+        self.state = state
+        self.history.append((timestamp, state))
+        return True
+
+    def __repr__(self):
+        side = "buy" if self.is_buy else "sell"
+        return f"ManagedOrder({self.coin} {side} {self.filled_sz}/{self.sz} @{self.px}, {self.state}, oid={self.oid}, cloid={self.cloid})"
+
+
+class OrderExecution:
+    """The orders placed by OrderManager.chase to fill one target size."""
+    def __init__(self, coin, is_buy, target_sz):
+        self.coin = coin
+        self.is_buy = is_buy
+        self.target_sz = target_sz
+        self.orders = []
+
+    @property
+    def filled_sz(self):
+        return sum(order.filled_sz for order in self.orders)
+
+    @property
+    def is_complete(self):
+        return self.filled_sz >= self.target_sz - SZ_EPSILON
+
+    @property
+    def last_order(self):
+        return self.orders[-1] if self.orders else None
+
+    @property
+    def has_live_orders(self):
+        """True if an order could not be cancelled and may still fill."""
+        return any(not order.is_terminal for order in self.orders)
+
+
+class OrderManager:
+    """
+    Places orders and tracks each one through the state machine
+    PENDING -> RESTING -> PARTIAL -> FILLED / CANCELLED / REJECTED, always with a deadline,
+    so a leg that never fills cannot block the strategy's thread forever.
+
+    Every order gets a cloid before it is sent. If sending fails (e.g. a timeout), we ask the
+    exchange whether that cloid arrived before resending it, so retries never double an order.
+    If that query fails too, we do not resend: the order stays PENDING until refresh() finds out.
+
+    clock and sleep can be replaced, e.g. by market_data_replay.ReplayDriver.
+    """
+    def __init__(self, exchange, info, wallet, poll_interval=1.0, max_submit_attempts=3):
+        self.exchange = exchange
+        self.info = info
+        self.wallet = wallet
+        self.poll_interval = poll_interval
+        self.max_submit_attempts = max_submit_attempts
+
+        self.clock = time.time
+        self.sleep = time.sleep
+
+        # cloids are (random session id << 64 | counter), unique across restarts and threads.
+        self._session = random.getrandbits(64)
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def next_cloid(self):
+        with self._lock:
+            self._counter += 1
+            return Cloid.from_int((self._session << 64) | self._counter)
+
+    def place(self, coin, is_buy, sz, px, order_type=None, reduce_only=False):
+        """Places a limit order (Gtc by default). Return the ManagedOrder."""
+        order_type = order_type or {"limit": {"tif": "Gtc"}}
+        order = ManagedOrder(coin, is_buy, sz, px, self.next_cloid(), self.clock())
+        is_ioc = order_type.get("limit", {}).get("tif") == "Ioc"
+        self._submit(order, is_ioc, lambda: self.exchange.order(
+            coin, is_buy, sz, px, order_type, reduce_only=reduce_only, cloid=order.cloid
+        ))
+        return order
+
+    def market_open(self, coin, is_buy, sz, slippage):
+        """
+        Places an Ioc order at the mid price plus slippage. Return the ManagedOrder, which is terminal
+        unless its status is unknown (see _submit).
+        """
+        order = ManagedOrder(coin, is_buy, sz, None, self.next_cloid(), self.clock())
+        self._submit(order, True, lambda: self.exchange.market_open(
+            coin, is_buy, sz, None, slippage, cloid=order.cloid
+        ))
+        return order
+
+    def market_close(self, coin, is_buy, sz, slippage=0.05):
+        """
+        Reduces the perp position in coin by sz with a reduce only Ioc order.
+        is_buy is the side of the closing order (True closes a short).
+        Return the ManagedOrder, which is terminal unless its status is unknown (see _submit);
+        it is REJECTED if there is no position.
+        """
+        order = ManagedOrder(coin, is_buy, sz, None, self.next_cloid(), self.clock())
+        self._submit(order, True, lambda: self.exchange.market_close(
+            coin, sz, None, slippage, cloid=order.cloid
+        ))
+        return order
+
+    def _submit(self, order, is_ioc, send):
+        for attempt in range(1, self.max_submit_attempts + 1):
+            try:
+                response = send()
+            except Exception as e:
+                print(f"Sending order {order.cloid} failed (attempt {attempt}): {e}")
+                # The request may still have reached the exchange; only resend if it did not.
+                known = self._refresh_by_cloid(order)
+                if known is None:
+                    # We cannot tell, and resending could double the order. Leave it to refresh().
+                    order.error = f"Sending failed and the order's status is unknown: {e}"
+                    return
+                if known:
+                    break
+                continue
+            self._apply_place_response(order, response, is_ioc)
+            break
+        else:
+            order.error = f"Could not send order after {self.max_submit_attempts} attempts."
+            order.transition(REJECTED, self.clock())
+
+        # An Ioc order never rests: whatever did not fill right away is cancelled.
+        if is_ioc and not order.is_terminal:
+            order.transition(CANCELLED, self.clock())
+
+    def _apply_place_response(self, order, response, is_ioc):
+        """
+        Sample response
+        {
+            "status": "ok",
+            "response": {
+                "type": "order",
+                "data": {"statuses": [{"resting": {"oid": 77738308}}]}
+            }
+        }
+        A status can also be {"filled": {"totalSz": "0.02", "avgPx": "1891.4", "oid": 77747314}}
+        or {"error": "Order must have minimum value of $10."}
+        """
+        order.response = response
+        now = self.clock()
+        # Exchange.market_close returns None when there is no position to close.
+        if response is None:
+            order.error = "No position to close."
+            order.transition(REJECTED, now)
+            return
+        if response.get("status") != "ok":
+            order.error = str(response)
+            order.transition(REJECTED, now)
+            return
+
+        status = response["response"]["data"]["statuses"][0]
+        if "resting" in status:
+            order.oid = status["resting"]["oid"]
+            order.transition(RESTING, now)
+        elif "filled" in status:
+            filled = status["filled"]
+            order.oid = filled["oid"]
+            order.filled_sz = float(filled["totalSz"])
+            order.avg_px = float(filled["avgPx"])
+            if order.filled_sz >= order.sz - SZ_EPSILON:
+                order.transition(FILLED, now)
+            else:
+                order.transition(PARTIAL, now)
+        else:
+            order.error = status.get("error", str(status))
+            # The exchange says the order was never placed, so the remaining size was not filled.
+            order.transition(CANCELLED if is_ioc and "could not immediately match" in order.error.lower() else REJECTED, now)
+
+    def _refresh_by_cloid(self, order):
+        """
+        Return True if the exchange knows about order.cloid (and updates the order),
+        False if it does not, and None if the query failed.
+        """
+        try:
+            data = self.info.query_order_by_cloid(self.wallet, order.cloid)
+        except Exception as e:
+            print(f"Querying order {order.cloid} failed: {e}")
+            return None
+        if data.get("status") != "order":
+            return False
+        self._apply_query(order, data)
+        return True
+
+    def refresh(self, order):
+        """Queries the order's status from the exchange and updates it."""
+        if order.is_terminal:
+            return order
+        if order.oid is None:
+            # Only an order whose sending failed has no oid. If the exchange does not know it, it never arrived.
+            if self._refresh_by_cloid(order) is False:
+                order.error = "The order never reached the exchange."
+                order.transition(REJECTED, self.clock())
+            return order
+        try:
+            data = self.info.query_order_by_oid(self.wallet, order.oid)
+        except Exception as e:
+            print(f"Querying order {order.oid} failed: {e}")
+            return order
+        if data.get("status") == "order":
+            self._apply_query(order, data)
+        return order
+
+    def _apply_query(self, order, data):
+        """
+        Sample query_order_by_oid / query_order_by_cloid response
+        {
+            "status": "order",
+            "order": {
+                "order": {"coin": "HYPE", "side": "B", "limitPx": "25.1", "sz": "0.5", "oid": 123,
+                          "timestamp": 1736219976887, "origSz": "1.96", "cloid": "0x..."},
+                "status": "open",
+                "statusTimestamp": 1736219976887
+            }
+        }
+        status is one of open, filled, canceled, triggered, rejected, marginCanceled, ...
+        """
+        now = self.clock()
+        status = data["order"]["status"]
+        details = data["order"]["order"]
+        order.oid = details["oid"]
+
+        orig_sz = float(details["origSz"])
+        remaining_sz = float(details["sz"])
+        # A filled order reports its remaining size as 0, so the difference is the filled size in every state.
+        order.filled_sz = max(order.filled_sz, orig_sz - remaining_sz)
+
+        if status == "filled":
+            order.filled_sz = orig_sz
+            order.transition(FILLED, now)
+        elif status in ("open", "triggered"):
+            order.transition(PARTIAL if order.filled_sz > SZ_EPSILON else RESTING, now)
+        elif status.lower().endswith("canceled"):
+            order.transition(CANCELLED, now)
+        elif status.lower().endswith("rejected"):
+            order.error = status
+            order.transition(REJECTED, now)
+        else:
+            print(f"Unknown status {status} for order {order.oid}.")
+
+    def cancel(self, order):
+        """
+        Cancels the order and settles its state.
+
+        The order is only marked CANCELLED once the exchange confirms the cancel or reports the
+        order as no longer open. If the cancel failed (e.g. it timed out) and the order still
+        looks open, it is left live: the caller must not re-place its remaining size.
+        Return the order; check order.is_terminal.
+        """
+        if order.is_terminal:
+            return order
+        confirmed = False
+        try:
+            if order.oid is not None:
+                result = self.exchange.cancel(order.coin, order.oid)
+            else:
+                result = self.exchange.cancel_by_cloid(order.coin, order.cloid)
+            print(f"Cancel {order.oid or order.cloid}: {result}")
+            confirmed = self._is_cancel_confirmed(result)
+        except Exception as e:
+            print(f"Cancelling order {order.oid or order.cloid} failed: {e}")
+
+        # The order may have filled (or been cancelled after all) before we asked.
+        self.refresh(order)
+        if not order.is_terminal:
+            if confirmed:
+                order.transition(CANCELLED, self.clock())
+            else:
+                print(f"Order {order.oid or order.cloid} may still be open; it was not cancelled.")
+        return order
+
+    def _is_cancel_confirmed(self, result):
+        """
+        Sample cancel response
+        {"status": "ok", "response": {"type": "cancel", "data": {"statuses": ["success"]}}}
+        A status can also be {"error": "Order was never placed, already canceled, or filled."}
+        """
+        if not isinstance(result, dict) or result.get("status") != "ok":
+            return False
+        statuses = result["response"]["data"]["statuses"]
+        return bool(statuses) and statuses[0] == "success"
+
+    def chase(self, coin, is_buy, sz, price_fn, round_fn, timeout, reprice_after, max_replaces=10, reduce_only=False):
+        """
+        Works a limit order until sz is filled or timeout seconds have passed.
+
+        Every reprice_after seconds the price is re-read with price_fn(); if it moved, the
+        resting order is cancelled and the remaining size is re-placed at the new price
+        (at most max_replaces times). round_fn(px, sz) -> (px, sz) makes both exchange compliant.
+
+        Return an OrderExecution. Whatever is still resting at the deadline is cancelled.
+        If a cancel cannot be confirmed, we stop rather than re-place the size of an order that
+        may still be live; execution.has_live_orders tells the caller.
+        """
+        execution = OrderExecution(coin, is_buy, sz)
+        deadline = self.clock() + timeout
+
+        while True:
+            px, size = round_fn(price_fn(), sz - execution.filled_sz)
+            if size <= 0:
+                break
+
+            order = self.place(coin, is_buy, size, px, reduce_only=reduce_only)
+            execution.orders.append(order)
+            print(f"Placed {order}")
+
+            replacing = False
+            reprice_at = min(self.clock() + reprice_after, deadline)
+            while not order.is_terminal:
+                self.sleep(self.poll_interval)
+                self.refresh(order)
+                if order.is_terminal:
+                    break
+
+                now = self.clock()
+                if now >= deadline:
+                    print(f"Order {order.oid} timed out after {timeout}s. Cancelling.")
+                    self.cancel(order)
+                    break
+                if now >= reprice_at:
+                    reprice_at = min(now + reprice_after, deadline)
+                    if len(execution.orders) > max_replaces:
+                        continue
+                    new_px, _ = round_fn(price_fn(), order.remaining_sz)
+                    if new_px != order.px:
+                        print(f"Price moved from {order.px} to {new_px}. Replacing order {order.oid}.")
+                        self.cancel(order)
+                        replacing = order.is_terminal
+                        break
+
+            print(f"Order {order.oid} is {order.state}, filled {order.filled_sz}/{order.sz}.")
+            if execution.is_complete or not replacing or self.clock() >= deadline:
+                break
+
+        return execution
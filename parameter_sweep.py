@@ -0,0 +1,357 @@
+import argparse
+import functools
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from hyperliquid.info import Info
+from hyperliquid.utils import constants
+
+
+HOUR_MS = 60 * 60 * 1000
+
+# Hyperliquid's base tier fees. We buy/sell spot as a maker and open/close the short as a taker.
+SPOT_MAKER_FEE = 0.0004
+PERP_TAKER_FEE = 0.00045
+
+# market_close uses the SDK's default slippage, not the strategy's.
+CLOSE_SLIPPAGE = 0.05
+
+# Share of an hour's high-low range we assume a market order moves through before it fills.
+IMPACT_FRACTION = 0.05
+
+# The values tried for each of HypeSpotPerpArbitrage's tunables by default; 1000 configurations.
+# The data is hourly, so intervals up to an hour all behave like a check every hour;
+# 15 minutes (the live default) stands for all of them.
+# The account check only warns, so account_check_interval and maintenance_margin_warning_ratio
+# never change what the strategy trades and are not swept.
+DEFAULT_GRID = {
+    "slippage": [0.0005, 0.001, 0.002, 0.003, 0.005, 0.0075, 0.01, 0.015, 0.02, 0.03],
+    "funding_check_interval": [15 * 60, 2 * 60 * 60, 4 * 60 * 60, 8 * 60 * 60, 12 * 60 * 60],
+    "funding_entry_threshold": [round(i * 0.0000025, 7) for i in range(20)],
+}
+
+# The candle endpoint only serves the most recent 5000 candles, about 208 days of hourly ones.
+MAX_CANDLES = 5000
+
+
+def fetch_market_data(coins, days, data_dir, base_url=constants.MAINNET_API_URL):
+    """
+    Downloads hourly candles and funding history of each coin and saves them to <data_dir>/<coin>.json.
+    Both endpoints return a limited number of rows per request, so we page through them.
+    Warns when the history starts later than requested, e.g. beyond the last MAX_CANDLES candles.
+    """
+    info = Info(base_url, skip_ws=True)
+    universe = {asset["name"]: asset for asset in info.meta()["universe"]}
+    end = int(time.time() * 1000)
+    start = end - days * 24 * HOUR_MS
+    os.makedirs(data_dir, exist_ok=True)
+
+    for coin in coins:
+        candles = []
+        cursor = start
+        while cursor < end:
+            page = info.candles_snapshot(coin, "1h", cursor, end)
+            if not page:
+                break
+            candles.extend(page)
+            cursor = page[-1]["t"] + 1
+
+        funding = []
+        cursor = start
+        while cursor < end:
+            page = info.funding_history(coin, cursor, end)
+            if not page:
+                break
+            funding.extend(page)
+            cursor = page[-1]["time"] + 1
+
+        _warn_if_short(coin, "candles", candles[0]["t"] if candles else None, start, end,
+                       f"The candle endpoint only serves the last {MAX_CANDLES} candles.")
+        _warn_if_short(coin, "funding rates", funding[0]["time"] if funding else None, start, end)
+
+        path = os.path.join(data_dir, f"{coin}.json")
+        with open(path, "w") as f:
+            json.dump({"coin": coin, "max_leverage": universe[coin]["maxLeverage"], "candles": candles, "funding": funding}, f)
+        print(f"Saved {len(candles)} candles and {len(funding)} funding rates of {coin} to {path}.")
+
+
+def _warn_if_short(coin, name, first_ms, start, end, note=""):
+    """Prints a warning if the history that starts at first_ms does not cover start to end."""
+    days = (end - start) / (24 * HOUR_MS)
+    if first_ms is None:
+        print(f"Warning: no {name} of {coin} between {format_time(start)} and {format_time(end)}.")
+    elif first_ms > start + HOUR_MS:
+        covered = (end - first_ms) / (24 * HOUR_MS)
+        print(f"Warning: {name} of {coin} only cover {covered:.0f} of the {days:.0f} days asked for, "
+              f"from {format_time(first_ms)}. {note}".rstrip())
+
+
+def format_time(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+
+
+class MarketData:
+    """
+    One coin's hourly history, aligned so that index i is the hour starting at hour_starts[i].
+    funding[i] is the rate settled at the end of hour i.
+    """
+    def __init__(self, coin, max_leverage, hour_starts, opens, highs, lows, closes, funding):
+        self.coin = coin
+        # Hyperliquid's maintenance margin is half the initial margin at max leverage.
+        self.maintenance_margin_rate = 1 / (2 * max_leverage)
+        self.hour_starts = hour_starts
+        self.opens = opens
+        self.highs = highs
+        self.lows = lows
+        self.closes = closes
+        self.funding = funding
+
+
+@functools.lru_cache(maxsize=None)
+def load_market_data(data_dir, coin):
+    """
+    Reads a file written by fetch_market_data. Cached, so every worker process parses each file once.
+
+    Sample candle: {"t": 1736218800000, "T": 1736222399999, "o": "25.1", "h": "25.9", "l": "24.8", "c": "25.5", ...}
+    Sample funding: {"coin": "HYPE", "fundingRate": "0.0000125", "premium": "0.0003", "time": 1736222400012}
+    """
+    with open(os.path.join(data_dir, f"{coin}.json")) as f:
+        raw = json.load(f)
+
+    # Funding is paid at the top of the hour for the hour that just ended.
+    funding_by_hour = {}
+    for entry in raw["funding"]:
+        settled_at = entry["time"] // HOUR_MS * HOUR_MS
+        funding_by_hour[settled_at - HOUR_MS] = float(entry["fundingRate"])
+
+    candles = sorted(raw["candles"], key=lambda candle: candle["t"])
+    hour_starts, opens, highs, lows, closes, funding = [], [], [], [], [], []
+    for candle in candles:
+        hour_starts.append(candle["t"])
+        opens.append(float(candle["o"]))
+        highs.append(float(candle["h"]))
+        lows.append(float(candle["l"]))
+        closes.append(float(candle["c"]))
+        funding.append(funding_by_hour.get(candle["t"], 0.0))
+
+    return MarketData(coin, raw["max_leverage"], hour_starts, opens, highs, lows, closes, funding)
+
+
+@functools.lru_cache(maxsize=None)
+def _hours_with_check(interval, hours):
+    """Return a tuple of booleans: whether a check running every interval seconds falls in each hour."""
+    hour = 3600
+    return tuple((i * hour + interval - 1) // interval * interval < (i + 1) * hour for i in range(hours))
+
+
+def simulate(data, params, capital=1.0):
+    """
+    Runs HypeSpotPerpArbitrage's logic with params over one coin's hourly history.
+
+    Funding checks happen at the start of an hour and use the last settled funding rate. We buy
+    spot as a maker at the open, and open the short with a market order. Spot orders are assumed
+    to fill in full at once, although live they are chased and can time out partly or not filled. That order fills only if
+    the assumed price impact (IMPACT_FRACTION of the hour's range) is within params["slippage"].
+    Otherwise the strategy retries at the next funding check, unhedged until then.
+    The live account check only warns, so it is not modelled: the exchange liquidates the short
+    once its margin is below maintenance at the hour's high, the worst price for the short.
+
+    Return a dict of net_carry, max_drawdown and fee_cost (fees plus slippage), all as a fraction of capital,
+    plus the number of trades and liquidations.
+    """
+    allocation = capital / 2
+    hours = len(data.closes)
+    funding_checks = _hours_with_check(params["funding_check_interval"], hours)
+    threshold = params["funding_entry_threshold"]
+    slippage = params["slippage"]
+    mm_rate = data.maintenance_margin_rate
+
+    realized = 0.0
+    fee_cost = 0.0
+    spot_size = perp_size = 0.0
+    spot_entry = perp_entry = 0.0
+    funding_since_open = 0.0
+    trades = liquidations = 0
+    peak = capital
+    max_drawdown = 0.0
+
+    opens, highs, lows, closes, funding = data.opens, data.highs, data.lows, data.closes, data.funding
+    for i in range(hours):
+        px = opens[i]
+        impact = (highs[i] - lows[i]) / px * IMPACT_FRACTION
+
+        if funding_checks[i]:
+            known_rate = funding[i - 1] if i else 0.0
+            if known_rate > threshold:
+                if spot_size == 0.0 and perp_size == 0.0:
+                    spot_size = allocation / px
+                    spot_entry = px
+                    fee_cost += allocation * SPOT_MAKER_FEE
+                    trades += 1
+                if spot_size > 0.0 and perp_size == 0.0 and impact <= slippage:
+                    perp_size = spot_size
+                    perp_entry = px
+                    funding_since_open = 0.0
+                    fee_cost += perp_size * px * (PERP_TAKER_FEE + impact)
+                    trades += 1
+            elif spot_size > 0.0 or perp_size > 0.0:
+                realized += spot_size * (px - spot_entry) + perp_size * (perp_entry - px)
+                fee_cost += spot_size * px * SPOT_MAKER_FEE + perp_size * px * (PERP_TAKER_FEE + min(impact, CLOSE_SLIPPAGE))
+                trades += (spot_size > 0.0) + (perp_size > 0.0)
+                spot_size = perp_size = 0.0
+
+        if perp_size > 0.0:
+            high = highs[i]
+            perp_account = allocation + perp_size * (perp_entry - high) + funding_since_open
+            maintenance = mm_rate * perp_size * high
+            if perp_account <= maintenance:
+                # Liquidated: the short is closed at the high and its remaining margin is lost.
+                realized += perp_size * (perp_entry - high) - maintenance
+                liquidations += 1
+                perp_size = 0.0
+
+        # Shorts receive funding when the rate is positive.
+        if perp_size > 0.0:
+            payment = funding[i] * perp_size * closes[i]
+            realized += payment
+            funding_since_open += payment
+
+        close = closes[i]
+        equity = capital + realized - fee_cost + spot_size * (close - spot_entry) + perp_size * (perp_entry - close)
+        if equity > peak:
+            peak = equity
+        elif (peak - equity) / capital > max_drawdown:
+            max_drawdown = (peak - equity) / capital
+
+    close = closes[-1] if hours else 0.0
+    equity = capital + realized - fee_cost + spot_size * (close - spot_entry) + perp_size * (perp_entry - close)
+    return {
+        "net_carry": (equity - capital) / capital,
+        "max_drawdown": max_drawdown,
+        "fee_cost": fee_cost / capital,
+        "trades": trades,
+        "liquidations": liquidations,
+    }
+
+
+# Set in each worker process by _init_worker, so the data is loaded once per process, not per configuration.
+_worker_data = None
+
+
+def _init_worker(data_dir, coins):
+    global _worker_data
+    _worker_data = [load_market_data(data_dir, coin) for coin in coins]
+
+
+def _run_config(params):
+    """Simulates one configuration on every coin. Coins get equal capital."""
+    per_coin = [simulate(data, params) for data in _worker_data]
+    return {
+        "params": params,
+        "net_carry": sum(result["net_carry"] for result in per_coin) / len(per_coin),
+        "max_drawdown": max(result["max_drawdown"] for result in per_coin),
+        "fee_cost": sum(result["fee_cost"] for result in per_coin) / len(per_coin),
+        "trades": sum(result["trades"] for result in per_coin),
+        "liquidations": sum(result["liquidations"] for result in per_coin),
+    }
+
+
+def make_configs(grid, samples=None, seed=0):
+    """Return every combination of the grid, or a random sample of samples of them."""
+    names = list(grid)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    if samples is not None and samples < len(configs):
+        configs = random.Random(seed).sample(configs, samples)
+    return configs
+
+
+def dominates(a, b):
+    """a dominates b if it is no worse in net carry, drawdown and fee cost, and better in one of them."""
+    no_worse = a["net_carry"] >= b["net_carry"] and a["max_drawdown"] <= b["max_drawdown"] and a["fee_cost"] <= b["fee_cost"]
+    better = a["net_carry"] > b["net_carry"] or a["max_drawdown"] < b["max_drawdown"] or a["fee_cost"] < b["fee_cost"]
+    return no_worse and better
+
+
+def pareto_front(results):
+    """Return the results that no other result dominates, best net carry first."""
+    front = [result for result in results if not any(dominates(other, result) for other in results)]
+    return sorted(front, key=lambda result: result["net_carry"], reverse=True)
+
+
+def run_sweep(data_dir, coins, grid=None, samples=None, max_workers=None):
+    """
+    Simulates every configuration of the grid over the coins' history across a process pool.
+    Return (all results, Pareto front).
+    """
+    configs = make_configs(grid or DEFAULT_GRID, samples)
+    # Fail early, in this process, if a coin's data is missing.
+    for coin in coins:
+        load_market_data(data_dir, coin)
+
+    max_workers = max_workers or os.cpu_count()
+    chunksize = max(1, len(configs) // (max_workers * 4))
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(data_dir, tuple(coins))) as executor:
+        results = list(executor.map(_run_config, configs, chunksize=chunksize))
+    return results, pareto_front(results)
+
+
+def parse_grid(overrides):
+    """Parses ["slippage=0.005,0.01", ...] into a copy of DEFAULT_GRID with those values replaced."""
+    grid = dict(DEFAULT_GRID)
+    for override in overrides or []:
+        name, _, values = override.partition("=")
+        if name not in grid:
+            raise Exception(f"Unknown parameter {name}. Choose from {list(grid)}.")
+        grid[name] = [type(grid[name][0])(value) for value in values.split(",")]
+    return grid
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep HypeSpotPerpArbitrage's parameters over historical data.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fetch_parser = subparsers.add_parser("fetch", help="download hourly candles and funding history")
+    fetch_parser.add_argument("--coins", nargs="+", default=["HYPE"])
+    fetch_parser.add_argument("--days", type=int, default=365)
+    fetch_parser.add_argument("--data-dir", default="market_data")
+
+    sweep_parser = subparsers.add_parser("sweep", help="run the parameter sweep")
+    sweep_parser.add_argument("--coins", nargs="+", default=["HYPE"])
+    sweep_parser.add_argument("--data-dir", default="market_data")
+    sweep_parser.add_argument("--grid", nargs="*", help="override the values of a parameter, e.g. slippage=0.005,0.01")
+    sweep_parser.add_argument("--samples", type=int, help="run a random sample of this many configurations instead of the whole grid")
+    sweep_parser.add_argument("--workers", type=int)
+    sweep_parser.add_argument("--output", help="save every result to this JSON file")
+    args = parser.parse_args()
+
+    if args.command == "fetch":
+        fetch_market_data(args.coins, args.days, args.data_dir)
+    else:
+        for coin in args.coins:
+            data = load_market_data(args.data_dir, coin)
+            if data.hour_starts:
+                print(f"{coin}: {format_time(data.hour_starts[0])} to {format_time(data.hour_starts[-1] + HOUR_MS)}, "
+                      f"{len(data.hour_starts)} hours.")
+            else:
+                print(f"{coin}: no data.")
+
+        start = time.perf_counter()
+        results, front = run_sweep(args.data_dir, args.coins, parse_grid(args.grid), args.samples, args.workers)
+        elapsed = time.perf_counter() - start
+
+        print(f"Simulated {len(results)} configurations on {', '.join(args.coins)} in {elapsed:.1f}s.")
+        print(f"Pareto front of net carry vs drawdown vs fee cost ({len(front)} configurations):")
+        print(f"{'net carry':>10}{'drawdown':>10}{'fees':>10}{'trades':>8}{'liq':>5}  parameters")
+        for result in front:
+            print(f"{result['net_carry']:>10.4%}{result['max_drawdown']:>10.4%}{result['fee_cost']:>10.4%}"
+                  f"{result['trades']:>8}{result['liquidations']:>5}  {result['params']}")
+
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"results": results, "pareto_front": front}, f, indent=4)
+            print(f"Saved results to {args.output}.")
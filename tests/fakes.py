@@ -0,0 +1,151 @@
+"""In-memory stand-ins for hyperliquid's Info and Exchange, with just enough behaviour for the tests."""
+
+
+class FakeInfo:
+    def __init__(self, coin="HYPE", funding=0.0001, spot_px=25.0):
+        self.coin = coin
+        self.funding = funding
+        self.spot_px = spot_px
+        self.balances = {"USDC": 50.0, coin: 0.0}
+        self.withdrawable = 50.0
+        # Signed perp position (negative is short) and every order placed, by oid.
+        self.position = 0.0
+        self.orders = {}
+        # Make this many order queries raise, as if the network were down.
+        self.failing_queries = 0
+
+    def meta(self):
+        return {"universe": [{"name": self.coin, "szDecimals": 2, "maxLeverage": 3}]}
+
+    def spot_meta(self):
+        return {"tokens": [{"name": "USDC", "szDecimals": 8}, {"name": self.coin, "szDecimals": 2}]}
+
+    def meta_and_asset_ctxs(self):
+        ctx = {"funding": str(self.funding), "markPx": str(self.spot_px)}
+        return [self.meta(), [ctx]]
+
+    def spot_user_state(self, address):
+        return {"balances": [{"coin": coin, "total": str(total)} for coin, total in self.balances.items()]}
+
+    def user_state(self, address):
+        asset_positions = []
+        if self.position:
+            asset_positions.append({"type": "oneWay", "position": {"coin": self.coin, "szi": str(self.position)}})
+        return {"withdrawable": str(self.withdrawable), "assetPositions": asset_positions}
+
+    def query_order_by_oid(self, user, oid):
+        self._maybe_fail()
+        if oid not in self.orders:
+            return {"status": "unknownOid"}
+        order = self.orders[oid]
+        details = {"coin": order["coin"], "oid": oid, "sz": str(order["sz"]), "origSz": str(order["origSz"]),
+                   "cloid": order["cloid"]}
+        return {"status": "order", "order": {"order": details, "status": order["status"]}}
+
+    def query_order_by_cloid(self, user, cloid):
+        self._maybe_fail()
+        for oid, order in self.orders.items():
+            if order["cloid"] == cloid.to_raw():
+                return self.query_order_by_oid(user, oid)
+        return {"status": "unknownOid"}
+
+    def _maybe_fail(self):
+        if self.failing_queries:
+            self.failing_queries -= 1
+            raise ConnectionError("query failed")
+
+    def l2_snapshot(self, name):
+        bids = [{"px": str(self.spot_px - 0.01 * i)} for i in range(1, 4)]
+        asks = [{"px": str(self.spot_px + 0.01 * i)} for i in range(1, 4)]
+        return {"coin": name, "levels": [bids, asks]}
+
+
+class FakeExchange:
+    """
+    Rests every limit order, filling fill_ratio of it right away. Market orders fill in full.
+
+    cancel_failure makes cancels fail: "timeout" raises, "error" returns an error status.
+    lost_requests / lost_responses make that many order requests raise before / after reaching the book.
+    """
+    def __init__(self, info):
+        self.info = info
+        self.fill_ratio = 0.0
+        self.cancel_failure = None
+        self.lost_requests = 0
+        self.lost_responses = 0
+        self.sent = []
+        self._next_oid = 1
+
+    def usd_class_transfer(self, amount, to_perp):
+        return {"status": "ok"}
+
+    def order(self, name, is_buy, sz, limit_px, order_type, reduce_only=False, cloid=None):
+        self.sent.append(cloid)
+        if self.lost_requests:
+            self.lost_requests -= 1
+            raise TimeoutError("request timed out")
+
+        oid = self._next_oid
+        self._next_oid += 1
+        self.info.orders[oid] = {"coin": name, "is_buy": is_buy, "px": limit_px, "sz": sz, "origSz": sz,
+                                 "status": "open", "cloid": cloid.to_raw() if cloid else None}
+        self.fill(oid, sz * self.fill_ratio)
+
+        if self.lost_responses:
+            self.lost_responses -= 1
+            raise TimeoutError("read timed out")
+        return {"status": "ok", "response": {"type": "order", "data": {"statuses": [{"resting": {"oid": oid}}]}}}
+
+    def fill(self, oid, sz):
+        """Fills sz of a resting order and moves the balances."""
+        order = self.info.orders[oid]
+        sz = min(sz, order["sz"])
+        if sz <= 0:
+            return
+        order["sz"] = round(order["sz"] - sz, 8)
+        if order["sz"] == 0:
+            order["status"] = "filled"
+        side = 1 if order["is_buy"] else -1
+        self.info.balances[self.info.coin] += side * sz
+        self.info.balances["USDC"] -= side * sz * order["px"]
+
+    def cancel(self, name, oid):
+        if self.cancel_failure == "timeout":
+            raise TimeoutError("cancel timed out")
+        order = self.info.orders.get(oid)
+        if self.cancel_failure == "error" or order is None or order["status"] != "open":
+            status = {"error": "Order was never placed, already canceled, or filled."}
+        else:
+            order["status"] = "canceled"
+            status = "success"
+        return {"status": "ok", "response": {"type": "cancel", "data": {"statuses": [status]}}}
+
+    def market_open(self, name, is_buy, sz, px=None, slippage=0.05, cloid=None):
+        return self._market_fill(name, is_buy, sz, cloid)
+
+    def market_close(self, coin, sz=None, px=None, slippage=0.05, cloid=None):
+        if not self.info.position:
+            return None
+        sz = min(sz or abs(self.info.position), abs(self.info.position))
+        return self._market_fill(coin, self.info.position < 0, sz, cloid)
+
+    def _market_fill(self, name, is_buy, sz, cloid):
+        self.info.position = round(self.info.position + (sz if is_buy else -sz), 8)
+        oid = self._next_oid
+        self._next_oid += 1
+        self.info.orders[oid] = {"coin": name, "is_buy": is_buy, "px": self.info.spot_px, "sz": 0.0, "origSz": sz,
+                                 "status": "filled", "cloid": cloid.to_raw() if cloid else None}
+        filled = {"totalSz": str(sz), "avgPx": str(self.info.spot_px), "oid": oid}
+        return {"status": "ok", "response": {"type": "order", "data": {"statuses": [{"filled": filled}]}}}
+
+
+class FakeClock:
+    """A clock that only moves when something sleeps."""
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import benchmark_spot_perp_arb
+from benchmark_spot_perp_arb import compare_with_baseline, measure_memory, time_benchmark
+
+
+def test_regression_beyond_tolerance_is_flagged():
+    baseline = {"phase:check_funding_rate": {"median_us": 100.0}, "_round_perp_px_sz": {"median_us": 1.0}}
+    results = {"phase:check_funding_rate": {"median_us": 125.0}, "_round_perp_px_sz": {"median_us": 1.1}}
+
+    regressions = compare_with_baseline(results, baseline, tolerance=0.2)
+
+    assert regressions == [("phase:check_funding_rate", 100.0, 125.0)]
+
+
+def test_slowdown_within_tolerance_and_new_benchmarks_pass():
+    baseline = {"phase:check_funding_rate": {"median_us": 100.0}}
+    results = {"phase:check_funding_rate": {"median_us": 119.0}, "new_benchmark": {"median_us": 1000.0}}
+
+    assert compare_with_baseline(results, baseline, tolerance=0.2) == []
+
+
+@pytest.mark.parametrize("baseline_median_us, exit_code", [(1e-6, 1), (1e9, 0)])
+def test_check_exit_code(tmp_path, monkeypatch, baseline_median_us, exit_code):
+    name = "_round_perp_px_sz"
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({name: {"median_us": baseline_median_us}}))
+    monkeypatch.setattr("sys.argv", ["benchmark_spot_perp_arb.py", "--only", name, "--rounds", "2",
+                                     "--min-round-time", "0.001", "--baseline", str(baseline), "--check"])
+
+    assert benchmark_spot_perp_arb.main() == exit_code
+
+
+def test_time_benchmark_statistics():
+    result = time_benchmark(lambda: sum(range(100)), rounds=3, min_round_time=0.001)
+
+    assert result["rounds"] == 3
+    assert result["iterations"] >= 1
+    assert 0 < result["min_us"] <= result["median_us"] <= result["max_us"]
+
+
+def test_measure_memory_sees_what_a_call_keeps():
+    kept = []
+
+    peak_bytes, retained_blocks = measure_memory(lambda: kept.append(bytearray(10_000)), calls=10)
+
+    assert peak_bytes >= 10_000
+    assert retained_blocks >= 1
@@ -0,0 +1,94 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_transport import PooledTransport, current_gather
+
+
+class Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the connection open between requests.
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(payload.get("delay", 0))
+        body = json.dumps({"ok": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.url = f"http://127.0.0.1:{server.server_port}/info"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def transport():
+    transport = PooledTransport(max_workers=4)
+    yield transport
+    transport.close()
+
+
+def test_requests_reuse_one_connection(server, transport):
+    for _ in range(5):
+        assert transport.post(server.url, json={"type": "meta"}, timeout=5).json() == {"ok": True}
+
+    assert server.connections == 1
+
+
+def test_gather_runs_calls_concurrently(server, transport):
+    def slow():
+        return transport.post(server.url, json={"type": "l2Book", "delay": 0.2}, timeout=5).status_code
+
+    start = time.perf_counter()
+    results = transport.gather(slow, slow, slow, slow)
+    elapsed = time.perf_counter() - start
+
+    assert results == [200] * 4
+    # One after another they would take 0.8s.
+    assert elapsed < 0.5
+
+
+def test_gather_tags_its_calls(transport):
+    first = transport.gather(current_gather.get, current_gather.get)
+    second = transport.gather(current_gather.get)
+
+    assert first[0] == first[1] is not None
+    assert second[0] not in (None, first[0])
+    assert current_gather.get() is None
+
+
+def test_timing_summary_by_request_type(server, transport):
+    transport.post(server.url, json={"type": "meta"}, timeout=5)
+    transport.post(server.url, json={"type": "meta"}, timeout=5)
+    transport.post(server.url, json={"action": {"type": "order"}}, timeout=5)
+
+    summary = transport.timing_summary()
+
+    assert set(summary) == {"meta", "order"}
+    assert summary["meta"]["count"] == 2
+    assert summary["order"]["count"] == 1
+    assert set(summary["meta"]) == {"count", "mean_ms", "p50_ms", "p99_ms", "max_ms"}
+    assert summary["meta"]["max_ms"] >= summary["meta"]["p50_ms"] > 0
@@ -0,0 +1,162 @@
+import contextvars
+import threading
+import time
+from collections import deque
+
+import pytest
+
+from basic_spot_perp_arb import HypeSpotPerpArbitrage
+from fakes import FakeExchange, FakeInfo
+from http_transport import PooledTransport, current_gather
+from market_data_recorder import MarketDataReader, MarketDataRecorder
+from market_data_replay import ReplayDriver, ReplayMismatchError, ReplaySource
+
+
+def record(path, info):
+    recorder = MarketDataRecorder(str(path))
+    arbitrage = HypeSpotPerpArbitrage(info.coin, wallet="0xabc", info=info, exchange=FakeExchange(info), recorder=recorder)
+    return recorder, arbitrage
+
+
+def test_replay_reproduces_recorded_steps(tmp_path):
+    path = tmp_path / "hype.rec"
+    recorder, arbitrage = record(path, FakeInfo(funding=-0.0001))
+    arbitrage._check_funding_rate_once()
+    arbitrage._check_account_value_once()
+    recorder.close()
+
+    driver = ReplayDriver(str(path))
+    replayed = driver.run()
+
+    assert driver.ticks_replayed == 3
+    assert not driver.truncated
+    assert driver.errors == []
+    assert not replayed.is_spot_open and not replayed.is_perp_open
+
+
+def test_frames_reach_disk_before_close(tmp_path):
+    path = tmp_path / "hype.rec"
+    recorder, arbitrage = record(path, FakeInfo(funding=-0.0001))
+    arbitrage._check_funding_rate_once()
+
+    # The recorder is still open, as it would be when the strategy gets killed.
+    with MarketDataReader(str(path)) as reader:
+        frames = [frame for _, frame in reader]
+    assert frames[-1]["method"] == "meta_and_asset_ctxs"
+    recorder.close()
+
+
+def test_replay_stops_where_a_killed_recording_stops(tmp_path):
+    path = tmp_path / "hype.rec"
+    info = FakeInfo(funding=0.0001)
+    recorder, arbitrage = record(path, info)
+    arbitrage._check_account_value_once()
+
+    # The strategy gets killed right after reading the funding rate of its last step.
+    recorder.mark("check_funding_rate")
+    recorder.record_call("info", "meta_and_asset_ctxs", (), {}, response=info.meta_and_asset_ctxs())
+
+    driver = ReplayDriver(str(path))
+    driver.run()
+    recorder.close()
+
+    assert driver.truncated
+    assert driver.ticks_replayed == 2
+    assert driver.errors == []
+
+
+def record_calls(path, calls, gather=None):
+    """Records calls [(method, args)] on info in the __init__ tick, all in one gather if given."""
+    info = FakeInfo()
+    recorder = MarketDataRecorder(str(path))
+    recording_info, _ = recorder.attach(info.coin, "0xabc", info, FakeExchange(info))
+
+    def make_calls():
+        if gather is not None:
+            current_gather.set(gather)
+        for method, args in calls:
+            getattr(recording_info, method)(*args)
+
+    contextvars.copy_context().run(make_calls)
+    recorder.close()
+
+    driver = ReplayDriver(str(path))
+    driver._pending = deque(driver.ticks[0]["calls"])
+    return driver, ReplaySource(driver, "info")
+
+
+def test_replay_compares_arguments(tmp_path):
+    driver, info = record_calls(tmp_path / "hype.rec", [("l2_snapshot", ("HYPE/USDC",)), ("l2_snapshot", ("HYPE",))])
+
+    with pytest.raises(ReplayMismatchError):
+        info.l2_snapshot("HYPE")
+    assert info.l2_snapshot("HYPE/USDC")["coin"] == "HYPE/USDC"
+    assert info.l2_snapshot("HYPE")["coin"] == "HYPE"
+
+
+def test_replay_allows_any_order_within_a_gather(tmp_path):
+    calls = [("user_state", ("0xabc",)), ("spot_user_state", ("0xabc",))]
+    driver, info = record_calls(tmp_path / "hype.rec", calls, gather=1)
+
+    assert "balances" in info.spot_user_state("0xabc")
+    assert "withdrawable" in info.user_state("0xabc")
+    assert not driver._pending
+
+
+def test_replay_of_a_strategy_recorded_with_a_transport(tmp_path):
+    path = tmp_path / "hype.rec"
+    info = SlowSpotInfo(funding=0.0001)
+    exchange = FakeExchange(info)
+    exchange.fill_ratio = 1.0
+    transport = PooledTransport()
+    recorder = MarketDataRecorder(str(path))
+    arbitrage = HypeSpotPerpArbitrage(info.coin, wallet="0xabc", info=info, exchange=exchange,
+                                      recorder=recorder, transport=transport)
+    arbitrage.order_manager.poll_interval = 0.01
+
+    # Opens both legs; the gathered balance reads finish in the opposite order they were asked in.
+    arbitrage._check_funding_rate_once()
+    recorder.close()
+    transport.close()
+    assert arbitrage.is_spot_open and arbitrage.is_perp_open
+
+    driver = ReplayDriver(str(path))
+    replayed = driver.run()
+
+    assert driver.errors == []
+    assert replayed.is_spot_open and replayed.is_perp_open
+
+
+class SlowSpotInfo(FakeInfo):
+    def spot_user_state(self, address):
+        time.sleep(0.05)
+        return super().spot_user_state(address)
+
+
+def test_replay_of_steps_that_overlapped_live(tmp_path):
+    path = tmp_path / "hype.rec"
+    info = FakeInfo(funding=0.0001)
+    exchange = FakeExchange(info)
+    recorder = MarketDataRecorder(str(path))
+    arbitrage = HypeSpotPerpArbitrage(info.coin, wallet="0xabc", info=info, exchange=exchange, recorder=recorder)
+
+    def sleep(seconds):
+        # While the spot buy rests, the account thread runs a step, then the buy fills.
+        if not info.orders[1]["status"] == "filled":
+            account_thread = threading.Thread(target=arbitrage._check_account_value_once)
+            account_thread.start()
+            account_thread.join()
+            exchange.fill(1, info.orders[1]["sz"])
+
+    arbitrage.order_manager.sleep = sleep
+    arbitrage._check_funding_rate_once()
+    recorder.close()
+    assert arbitrage.is_spot_open and arbitrage.is_perp_open
+
+    driver = ReplayDriver(str(path))
+    replayed = driver.run()
+
+    assert not driver.truncated
+    assert driver.ticks_replayed == 3
+    assert driver.errors == []
+    assert replayed.is_spot_open and replayed.is_perp_open
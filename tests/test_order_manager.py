@@ -0,0 +1,249 @@
+import pytest
+
+from basic_spot_perp_arb import HypeSpotPerpArbitrage
+from fakes import FakeClock, FakeExchange, FakeInfo
+from order_manager import CANCELLED, FILLED, PARTIAL, PENDING, REJECTED, RESTING, ManagedOrder, OrderManager
+
+
+@pytest.fixture
+def info():
+    return FakeInfo()
+
+
+@pytest.fixture
+def exchange(info):
+    return FakeExchange(info)
+
+
+@pytest.fixture
+def manager(info, exchange):
+    manager = OrderManager(exchange, info, "0xabc")
+    clock = FakeClock()
+    manager.clock = clock
+    manager.sleep = clock.sleep
+    return manager
+
+
+def chase(manager, sz=10.0, prices=None, timeout=60, reprice_after=5):
+    prices = iter(prices) if prices is not None else None
+    price_fn = (lambda: next(prices)) if prices is not None else (lambda: 25.0)
+    return manager.chase("HYPE/USDC", True, sz, price_fn, lambda px, sz: (px, round(sz, 2)),
+                         timeout=timeout, reprice_after=reprice_after)
+
+
+def test_transitions_follow_the_state_machine():
+    order = ManagedOrder("HYPE", True, 1.0, 25.0, None, 0)
+    assert order.transition(RESTING, 1)
+    assert order.transition(PARTIAL, 2)
+    # A stale "open" update after a partial fill is ignored.
+    assert not order.transition(RESTING, 3)
+    assert order.transition(FILLED, 4)
+    assert not order.transition(CANCELLED, 5)
+    assert [state for _, state in order.history] == [PENDING, RESTING, PARTIAL, FILLED]
+    assert order.is_terminal
+
+
+def test_cancel_confirmed_by_exchange(manager):
+    order = manager.place("HYPE/USDC", True, 1.0, 25.0)
+    assert order.state == RESTING
+
+    manager.cancel(order)
+    assert order.state == CANCELLED
+
+
+@pytest.mark.parametrize("failure", ["timeout", "error"])
+def test_failed_cancel_leaves_the_order_live(manager, exchange, failure):
+    order = manager.place("HYPE/USDC", True, 1.0, 25.0)
+    exchange.cancel_failure = failure
+
+    manager.cancel(order)
+    assert order.state == RESTING
+    assert not order.is_terminal
+
+
+@pytest.mark.parametrize("failure", ["timeout", "error"])
+def test_chase_stops_when_a_cancel_fails(manager, exchange, info, failure):
+    exchange.cancel_failure = failure
+
+    # The price moves on every reprice, which would normally re-place the order each time.
+    execution = chase(manager, prices=[25.0 + i for i in range(100)])
+
+    assert len(execution.orders) == 1
+    assert len(info.orders) == 1
+    assert execution.has_live_orders
+    assert not execution.is_complete
+
+
+def test_cancel_after_partial_fill(manager, exchange):
+    order = manager.place("HYPE/USDC", True, 1.0, 25.0)
+    exchange.fill(order.oid, 0.4)
+    manager.refresh(order)
+    assert order.state == PARTIAL
+
+    manager.cancel(order)
+    assert order.state == CANCELLED
+    assert order.filled_sz == pytest.approx(0.4)
+    assert order.remaining_sz == pytest.approx(0.6)
+
+
+def test_chase_replaces_only_the_unfilled_size(manager, exchange):
+    exchange.fill_ratio = 0.5
+
+    execution = chase(manager, sz=10.0, prices=[25.0, 25.0, 26.0] + [26.0] * 100, timeout=8, reprice_after=2)
+
+    assert [order.sz for order in execution.orders] == [10.0, 5.0]
+    assert [order.state for order in execution.orders] == [CANCELLED, CANCELLED]
+    assert execution.filled_sz == pytest.approx(7.5)
+    assert not execution.has_live_orders
+
+
+def test_lost_request_is_resent_with_the_same_cloid(manager, exchange, info):
+    exchange.lost_requests = 1
+
+    order = manager.place("HYPE/USDC", True, 1.0, 25.0)
+
+    assert exchange.sent == [order.cloid, order.cloid]
+    assert len(info.orders) == 1
+    assert order.state == RESTING
+
+
+def test_lost_response_is_not_resent(manager, exchange, info):
+    exchange.lost_responses = 1
+
+    order = manager.place("HYPE/USDC", True, 1.0, 25.0)
+
+    # The exchange knows the cloid, so the order is picked up from there instead of being doubled.
+    assert exchange.sent == [order.cloid]
+    assert len(info.orders) == 1
+    assert order.state == RESTING
+    assert order.oid is not None
+
+
+def test_unknown_order_is_not_resent_when_the_lookup_fails(manager, exchange, info):
+    exchange.lost_responses = 1
+    info.failing_queries = 1
+
+    order = manager.place("HYPE/USDC", True, 1.0, 25.0)
+
+    # We cannot tell whether the order arrived, so it is neither resent nor given up on.
+    assert exchange.sent == [order.cloid]
+    assert order.state == PENDING
+    manager.refresh(order)
+    assert order.state == RESTING
+    assert len(info.orders) == 1
+
+
+def test_unknown_order_that_never_arrived_is_rejected_on_refresh(manager, exchange, info):
+    exchange.lost_requests = 1
+    info.failing_queries = 1
+
+    order = manager.place("HYPE/USDC", True, 1.0, 25.0)
+
+    assert order.state == PENDING
+    manager.refresh(order)
+    assert order.state == REJECTED
+    assert exchange.sent == [order.cloid]
+    assert info.orders == {}
+
+
+def test_gives_up_after_max_submit_attempts(manager, exchange, info):
+    exchange.lost_requests = manager.max_submit_attempts
+
+    order = manager.place("HYPE/USDC", True, 1.0, 25.0)
+
+    assert order.state == REJECTED
+    assert info.orders == {}
+
+
+def test_market_close_without_position_is_rejected(manager):
+    order = manager.market_close("HYPE", True, 1.0)
+    assert order.state == REJECTED
+
+
+@pytest.fixture
+def arbitrage(info, exchange):
+    arbitrage = HypeSpotPerpArbitrage(info.coin, wallet="0xabc", info=info, exchange=exchange)
+    clock = FakeClock()
+    arbitrage.order_manager.clock = clock
+    arbitrage.order_manager.sleep = clock.sleep
+    info.balances[info.coin] = 2.0
+    info.position = -2.0
+    arbitrage.is_spot_open = arbitrage.is_perp_open = True
+    return arbitrage
+
+
+def test_close_positions_closes_both_legs(arbitrage, exchange, info):
+    exchange.fill_ratio = 1.0
+
+    arbitrage.close_positions()
+
+    assert info.balances[info.coin] == pytest.approx(0.0)
+    assert info.position == 0.0
+    assert not arbitrage.is_spot_open and not arbitrage.is_perp_open
+
+
+def test_close_positions_keeps_the_hedge_when_the_spot_sell_is_partial(arbitrage, exchange, info):
+    exchange.fill_ratio = 0.25
+    exchange.cancel_failure = "timeout"
+
+    arbitrage.close_positions()
+
+    # Only the 0.5 that was sold is bought back, and both legs are still open.
+    assert info.balances[info.coin] == pytest.approx(1.5)
+    assert info.position == pytest.approx(-1.5)
+    assert arbitrage.is_spot_open and arbitrage.is_perp_open
+
+
+def test_close_positions_with_unsold_spot_keeps_the_short(arbitrage, exchange, info):
+    exchange.cancel_failure = "error"
+
+    arbitrage.close_positions()
+
+    assert info.position == -2.0
+    assert arbitrage.is_spot_open and arbitrage.is_perp_open
+
+
+def test_unconfirmed_spot_buy_keeps_the_spot_leg_open(info, exchange):
+    info.funding = 0.0001
+    arbitrage = HypeSpotPerpArbitrage(info.coin, wallet="0xabc", info=info, exchange=exchange)
+    clock = FakeClock()
+    arbitrage.order_manager.clock = clock
+    arbitrage.order_manager.sleep = clock.sleep
+    exchange.cancel_failure = "timeout"
+
+    arbitrage._check_funding_rate_once()
+    arbitrage._check_funding_rate_once()
+
+    # The buy that timed out may still fill, so no second buy goes on top of it.
+    assert [order["status"] for order in info.orders.values()] == ["open"]
+    assert arbitrage.is_spot_open and not arbitrage.is_perp_open
+
+    # Once the cancel goes through, nothing was bought and the next entry can start from scratch.
+    exchange.cancel_failure = None
+    arbitrage._check_funding_rate_once()
+    assert [order["status"] for order in info.orders.values()] == ["canceled"]
+    assert not arbitrage.is_spot_open and not arbitrage.is_perp_open
+
+
+def test_perp_short_with_unknown_status_is_not_doubled(arbitrage, exchange, info):
+    info.funding = 0.0001
+    info.position = 0.0
+    arbitrage.is_perp_open = False
+    market_open = exchange.market_open
+
+    def lose_response(*args, **kwargs):
+        market_open(*args, **kwargs)
+        raise TimeoutError("read timed out")
+
+    # The short goes through, but both its response and the lookup of its cloid get lost.
+    exchange.market_open = lose_response
+    info.failing_queries = 1
+
+    arbitrage._check_funding_rate_once()
+    assert info.position == -2.0
+    assert not arbitrage.is_perp_open
+
+    # The next step finds out the short went through instead of sending another one.
+    arbitrage._check_funding_rate_once()
+    assert info.position == -2.0
+    assert arbitrage.is_perp_open
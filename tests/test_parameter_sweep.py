@@ -0,0 +1,133 @@
+import json
+
+import pytest
+
+from parameter_sweep import (
+    DEFAULT_GRID, HOUR_MS, PERP_TAKER_FEE, SPOT_MAKER_FEE, MarketData, _hours_with_check, load_market_data,
+    make_configs, pareto_front, parse_grid, simulate,
+)
+
+HOUR = 60 * 60
+
+
+def market_data(closes, funding, highs=None, lows=None, max_leverage=3):
+    """Hourly history where each hour opens at the previous close."""
+    opens = [closes[0]] + closes[:-1]
+    highs = highs or [max(o, c) for o, c in zip(opens, closes)]
+    lows = lows or [min(o, c) for o, c in zip(opens, closes)]
+    hour_starts = [i * HOUR_MS for i in range(len(closes))]
+    return MarketData("HYPE", max_leverage, hour_starts, opens, highs, lows, closes, funding)
+
+
+def params(**overrides):
+    return {"slippage": 0.01, "funding_check_interval": HOUR, "funding_entry_threshold": 0.0, **overrides}
+
+
+def test_enters_above_threshold_and_collects_funding():
+    data = market_data([10.0] * 5, [0.001] * 5)
+
+    result = simulate(data, params())
+
+    # The first check has no settled rate yet, so both legs open at hour 1 and earn 4 hours of funding.
+    fees = 0.5 * SPOT_MAKER_FEE + 0.5 * PERP_TAKER_FEE
+    assert result["trades"] == 2
+    assert result["fee_cost"] == pytest.approx(fees)
+    assert result["net_carry"] == pytest.approx(4 * 0.001 * 0.5 - fees)
+    assert result["liquidations"] == 0
+
+
+def test_does_not_enter_at_or_below_threshold():
+    data = market_data([10.0] * 5, [0.0001] * 5)
+
+    result = simulate(data, params(funding_entry_threshold=0.0001))
+
+    assert result["trades"] == 0
+    assert result["net_carry"] == 0.0
+
+
+def test_skips_the_hedge_when_impact_exceeds_slippage():
+    # The hour's range is 20% of the price, so a market order moves through 1%.
+    data = market_data([10.0] * 5, [0.001] * 5, highs=[11.0] * 5, lows=[9.0] * 5)
+
+    hedged = simulate(data, params(slippage=0.02))
+    unhedged = simulate(data, params(slippage=0.005))
+
+    assert hedged["trades"] == 2
+    # Only the spot leg opens, so no funding is earned.
+    assert unhedged["trades"] == 1
+    assert unhedged["net_carry"] == pytest.approx(-0.5 * SPOT_MAKER_FEE)
+
+
+def test_exits_when_funding_drops():
+    data = market_data([10.0] * 6, [0.001, 0.001, -0.001, -0.001, -0.001, -0.001])
+
+    result = simulate(data, params())
+
+    # Opened at hour 1, closed at hour 3 once the negative rate of hour 2 is known.
+    assert result["trades"] == 4
+    assert result["net_carry"] == pytest.approx(0.001 * 0.5 - 0.001 * 0.5 - result["fee_cost"])
+
+
+def test_short_is_liquidated_when_the_price_doubles():
+    closes = [10.0, 10.0, 10.0, 20.0, 20.0]
+    data = market_data(closes, [0.0001] * 5)
+
+    result = simulate(data, params())
+
+    # The spot gain covers the short's loss, but the short's maintenance margin is lost.
+    assert result["liquidations"] == 1
+    assert result["net_carry"] < -0.1
+
+
+def test_check_cadence():
+    assert _hours_with_check(15 * 60, 4) == (True, True, True, True)
+    assert _hours_with_check(HOUR, 4) == (True, True, True, True)
+    assert _hours_with_check(2 * HOUR, 4) == (True, False, True, False)
+    assert _hours_with_check(90 * 60, 6) == (True, True, False, True, True, False)
+
+    # With checks every 2 hours, the entry waits for the check at hour 2.
+    data = market_data([10.0] * 5, [0.001] * 5)
+    assert simulate(data, params(funding_check_interval=2 * HOUR))["net_carry"] < simulate(data, params())["net_carry"]
+
+
+def test_default_grid_has_no_equivalent_configurations():
+    behaviours = {
+        (config["slippage"], _hours_with_check(config["funding_check_interval"], 24), config["funding_entry_threshold"])
+        for config in make_configs(DEFAULT_GRID)
+    }
+    assert len(behaviours) == len(make_configs(DEFAULT_GRID)) == 1000
+
+
+def test_pareto_front_keeps_non_dominated_results():
+    best_carry = {"net_carry": 0.3, "max_drawdown": 0.2, "fee_cost": 0.02}
+    safest = {"net_carry": 0.1, "max_drawdown": 0.05, "fee_cost": 0.02}
+    cheapest = {"net_carry": 0.05, "max_drawdown": 0.3, "fee_cost": 0.001}
+    dominated = {"net_carry": 0.1, "max_drawdown": 0.2, "fee_cost": 0.02}
+    duplicate = dict(safest)
+
+    front = pareto_front([dominated, cheapest, safest, best_carry, duplicate])
+
+    assert front == [best_carry, safest, duplicate, cheapest]
+
+
+def test_parse_grid():
+    grid = parse_grid(["slippage=0.005,0.01", "funding_check_interval=3600"])
+
+    assert grid["slippage"] == [0.005, 0.01]
+    assert grid["funding_check_interval"] == [3600]
+    assert grid["funding_entry_threshold"] == DEFAULT_GRID["funding_entry_threshold"]
+    with pytest.raises(Exception):
+        parse_grid(["maintenance_margin_warning_ratio=1.2"])
+
+
+def test_load_market_data_aligns_funding_with_the_hour_it_is_paid_for(tmp_path):
+    candles = [{"t": i * HOUR_MS, "o": "10", "h": "11", "l": "9", "c": "10.5"} for i in range(3)]
+    # Funding settles a few ms after the top of the hour, for the hour that just ended.
+    funding = [{"fundingRate": str(0.0001 * (i + 1)), "time": (i + 1) * HOUR_MS + 12} for i in range(2)]
+    (tmp_path / "HYPE.json").write_text(json.dumps({"coin": "HYPE", "max_leverage": 5, "candles": candles, "funding": funding}))
+
+    data = load_market_data(str(tmp_path), "HYPE")
+
+    assert data.funding == [0.0001, 0.0002, 0.0]
+    assert data.closes == [10.5] * 3
+    assert data.maintenance_margin_rate == pytest.approx(0.1)